@@ -26,7 +26,7 @@ def get_statement_details(statement_id, keywords=None, offset=None, size=None):
     return ctrl.get_statement_details(statement_id, keywords=keywords, offset=offset, size=size)
 
 
-def get_statements(s=None, s_keywords=None, s_categories=None, edge_label=None, relation=None, t=None, t_keywords=None, t_categories=None, offset=None, size=None):  # noqa: E501
+def get_statements(s=None, s_keywords=None, s_categories=None, edge_label=None, relation=None, t=None, t_keywords=None, t_categories=None, offset=None, size=None, cursor=None):  # noqa: E501
     """get_statements
 
     Given a constrained set of some [CURIE-encoded](https://www.w3.org/TR/curie/) &#39;s&#39; (&#39;source&#39;) concept identifiers, categories and/or keywords (to match in the concept name or description), retrieves a list of relationship statements where either the subject or the object concept matches any of the input source concepts provided.  Optionally, a set of some &#39;t&#39; (&#39;target&#39;) concept identifiers, categories and/or keywords (to match in the concept name or description) may also be given, in which case a member of the &#39;t&#39; concept set should matchthe concept opposite an &#39;s&#39; concept in the statement. That is, if the &#39;s&#39; concept matches a subject, then the &#39;t&#39; concept should match the object of a given statement (or vice versa).  # noqa: E501
@@ -51,7 +51,17 @@ def get_statements(s=None, s_keywords=None, s_categories=None, edge_label=None,
     :type offset: int
     :param size: maximum number of concept entries requested by the client; if this argument is omitted, then the query is expected to returned all  the available data for the query
     :type size: int
+    :param cursor: (Optional) paginate with a cursor instead of an offset: &#39;*&#39; requests the first page, and each page&#39;s X-Next-Cursor response header holds the cursor of the next one (it is absent on the last page). Statements are then ordered by predicate, subject id and object id, and offset is ignored.
+    :type cursor: str
 
     :rtype: List[BeaconStatement]
     """
+    if cursor is not None:
+        try:
+            statements, next_cursor = ctrl.get_statements_page(s=s, s_keywords=s_keywords, s_categories=s_categories, edge_label=edge_label, relation=relation, t=t, t_keywords=t_keywords, t_categories=t_categories, size=size, cursor=cursor)
+        except ValueError as e:
+            return str(e), 400
+        headers = {'X-Next-Cursor' : next_cursor} if next_cursor is not None else {}
+        return statements, 200, headers
+
     return ctrl.get_statements(s=s, s_keywords=s_keywords, s_categories=s_categories, edge_label=edge_label, relation=relation, t=t, t_keywords=t_keywords, t_categories=t_categories, offset=offset, size=size)
@@ -0,0 +1,92 @@
+# coding: utf-8
+
+"""
+A small hand written Rhea graph for tests that evaluate the beacon's SPARQL
+queries with the local provider instead of the remote endpoint.
+
+    RHEA:10000  ATP + D-glucose = ADP + D-glucose 6-phosphate   EC 2.7.1.1
+    RHEA:10004  ADP + water = ATP                               EC 2.7.1.1, 3.1.3.9
+    RHEA:10008  obsolete                                        EC 3.1.3.9
+    RHEA:10012  D-glucose + water = D-glucose 6-phosphate
+"""
+
+from __future__ import absolute_import
+
+import unittest
+from unittest import mock
+
+from config import config
+from beacon_controller.providers import datasets, rhea
+
+try:
+    import rdflib
+except ImportError:
+    rdflib = None
+
+COMPOUNDS = {
+    'CHEBI:1' : 'water',
+    'CHEBI:2' : 'ATP',
+    'CHEBI:3' : 'ADP',
+    'CHEBI:4' : 'D-glucose',
+    'CHEBI:5' : 'D-glucose 6-phosphate',
+}
+
+# Reaction number: (status, left compounds, right compounds, EC numbers, PubMed ids)
+REACTIONS = {
+    10000 : ('Approved', [2, 4], [3, 5], ['2.7.1.1'], [100, 101]),
+    10004 : ('Approved', [3, 1], [2], ['2.7.1.1', '3.1.3.9'], [102]),
+    10008 : ('Obsolete', [1], [2], ['3.1.3.9'], []),
+    10012 : ('Approved', [4, 1], [5], [], []),
+}
+
+def equation(left, right) -> str:
+    return ' = '.join(' + '.join(COMPOUNDS[f'CHEBI:{c}'] for c in side) for side in (left, right))
+
+def turtle() -> str:
+    lines = [
+        '@prefix rh: <http://rdf.rhea-db.org/> .',
+        '@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .',
+        '@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .',
+        '@prefix ec: <http://purl.uniprot.org/enzyme/> .',
+        '@prefix pubmed: <http://rdf.ncbi.nlm.nih.gov/pubmed/> .',
+    ]
+
+    for curie, name in COMPOUNDS.items():
+        lines.append(f'rh:Compound_{curie[6:]} rh:accession "{curie}" ; rh:name "{name}" .')
+
+    for number, (status, left, right, ecs, pmids) in REACTIONS.items():
+        lines.append(f'rh:{number} rdfs:subClassOf rh:Reaction ; rh:status rh:{status} ; rh:accession "RHEA:{number}" ; rh:equation "{equation(left, right)}" .')
+        lines.extend(f'rh:{number} rh:ec ec:{ec} .' for ec in ecs)
+        lines.extend(f'rh:{number} rh:citation pubmed:{pmid} .' for pmid in pmids)
+
+        # Rhea types the curated order as xsd:int
+        for order, side, compounds in ((1, 'L', left), (2, 'R', right)):
+            lines.append(f'rh:{number} rh:side rh:{number}_{side} . rh:{number}_{side} rh:curatedOrder "{order}"^^xsd:int .')
+            for c in compounds:
+                lines.append(f'rh:{number}_{side} rh:contains rh:Participant_{number}_{side}_{c} . rh:Participant_{number}_{side}_{c} rh:compound rh:Compound_{c} .')
+
+    return '\n'.join(lines)
+
+def load_sample():
+    g = rdflib.Graph()
+    g.parse(data=turtle(), format='turtle')
+    return g
+
+@unittest.skipIf(rdflib is None, 'rdflib is not installed')
+class LocalProviderTestCase(unittest.TestCase):
+    """
+    Answers SPARQL queries from the sample graph, without the query cache or
+    the statement tables, and names enzymes by their CURIE.
+    """
+
+    def setUp(self):
+        patchers = [
+            mock.patch.dict(config, provider='local'),
+            mock.patch.dict(config['cache'], enabled=False),
+            mock.patch.dict(config['graph'], edge_tables=False),
+            mock.patch.dict(datasets.registry.values, rdf=load_sample()),
+            mock.patch.object(rhea, 'get_enzyme_names', lambda curies: list(curies)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
@@ -0,0 +1,185 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from config import config
+from beacon_controller.providers import cache
+
+
+class TestQueryCache(unittest.TestCase):
+    """QueryCache unit tests"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(cache, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ttl(self):
+        c = cache.QueryCache(ttl=60)
+        c.put('a', 1)
+        self.now += 59
+        self.assertEqual(c.get('a'), 1)
+        self.now += 2
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(c.stats()['entries'], 0)
+
+    def test_no_ttl(self):
+        c = cache.QueryCache()
+        c.put('a', 1)
+        self.now += 10 ** 9
+        self.assertEqual(c.get('a'), 1)
+
+    def test_max_entries_evicts_least_recently_used(self):
+        c = cache.QueryCache(max_entries=2)
+        c.put('a', 1)
+        c.put('b', 2)
+        c.get('a')
+        c.put('c', 3)
+
+        self.assertIsNone(c.get('b'))
+        self.assertEqual(c.get('a'), 1)
+        self.assertEqual(c.get('c'), 3)
+        self.assertEqual(c.stats()['evictions'], 1)
+
+    def test_max_bytes(self):
+        c = cache.QueryCache(max_bytes=100)
+        c.put('a', 1, size=40)
+        c.put('b', 2, size=40)
+        c.put('c', 3, size=40)
+
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(c.stats()['bytes'], 80)
+
+        c.put('b', 2, size=10)
+        self.assertEqual(c.stats()['bytes'], 50)
+
+    def test_oversized_entry_is_not_cached(self):
+        c = cache.QueryCache(max_bytes=100)
+        c.put('a', 1, size=40)
+        c.put('b', 2, size=101)
+
+        self.assertIsNone(c.get('b'))
+        self.assertEqual(c.get('a'), 1)
+
+
+class TestNormalize(unittest.TestCase):
+    """Cache key normalization unit tests"""
+
+    def test_whitespace(self):
+        self.assertEqual(
+            cache.make_key('SELECT ?x\n    WHERE { ?x a ?y . }  '),
+            cache.make_key('SELECT ?x WHERE {\t?x a ?y . }')
+        )
+
+    def test_literals_are_verbatim(self):
+        self.assertNotEqual(cache.make_key('SELECT ?x WHERE { ?x ?p "a  b" }'), cache.make_key('SELECT ?x WHERE { ?x ?p "a b" }'))
+        self.assertNotEqual(cache.make_key("FILTER(?x = 'a\\'  b')"), cache.make_key("FILTER(?x = 'a\\' b')"))
+        self.assertIn('"""a\n\n b"""', cache.normalize('SELECT ?x WHERE { ?x ?p """a\n\n b""" }'))
+
+    def test_comments(self):
+        self.assertEqual(
+            cache.normalize('SELECT ?x # the "x"\nWHERE { ?x ?p <http://example.org/#y> }'),
+            'SELECT ?x WHERE { ?x ?p <http://example.org/#y> }'
+        )
+
+
+class TestSqliteCache(unittest.TestCase):
+    """SqliteCache unit tests"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache.sqlite')
+        self.addCleanup(shutil.rmtree, self.dir)
+
+        self.now = 1000.0
+        patcher = mock.patch.object(cache, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_round_trip(self):
+        c = cache.SqliteCache(self.path, '130', compress_threshold=100)
+        small = {'results' : {'bindings' : []}}
+        large = {'results' : {'bindings' : [{'x' : {'value' : str(i)}} for i in range(100)]}}
+        c.put('small', small, size=10)
+        c.put('large', large, size=2000)
+
+        self.assertEqual(c.lookup('small'), (small, 10))
+        self.assertEqual(c.lookup('large'), (large, 2000))
+        self.assertIsNone(c.get('missing'))
+
+    def test_shared_between_instances(self):
+        cache.SqliteCache(self.path, '130').put('a', [1, 2])
+        self.assertEqual(cache.SqliteCache(self.path, '130').get('a'), [1, 2])
+
+    def test_other_releases_are_purged(self):
+        cache.SqliteCache(self.path, '130').put('a', 1)
+
+        c = cache.SqliteCache(self.path, '131')
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(c.stats()['entries'], 0)
+
+    def test_expired_entries_are_purged(self):
+        c = cache.SqliteCache(self.path, '130', ttl=60, purge_interval=600)
+        c.put('a', 1)
+        self.now += 61
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(c.stats()['entries'], 1)
+
+        self.now += 600
+        c.put('b', 2)
+        self.assertEqual(c.stats()['entries'], 1)
+        self.assertEqual(c.get('b'), 2)
+
+
+class TestGetCache(unittest.TestCase):
+    """get_cache unit tests"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+        self.release = '130'
+        patchers = [
+            mock.patch.dict(config['cache'], enabled=True, persistent=True, path=os.path.join(self.dir, 'cache.sqlite')),
+            mock.patch.object(cache, 'get_release', lambda: self.release),
+            mock.patch.object(cache, 'query_cache', None),
+            mock.patch.object(cache, 'cache_release', None),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_persistent(self):
+        c = cache.get_cache()
+        self.assertIsInstance(c, cache.TieredCache)
+        self.assertIs(cache.get_cache(), c)
+
+    def test_unknown_release_is_cached_in_memory(self):
+        self.release = cache.UNKNOWN
+        self.assertIsInstance(cache.get_cache(), cache.QueryCache)
+
+        self.release = '130'
+        self.assertIsInstance(cache.get_cache(), cache.TieredCache)
+
+    def test_release_change(self):
+        c = cache.get_cache()
+        c.put('a', 1)
+
+        self.release = '131'
+        self.assertIsNot(cache.get_cache(), c)
+        self.assertIsNone(cache.get_cache().get('a'))
+
+    def test_disabled(self):
+        with mock.patch.dict(config['cache'], enabled=False):
+            self.assertIsNone(cache.get_cache())
+
+
+if __name__ == '__main__':
+    unittest.main()
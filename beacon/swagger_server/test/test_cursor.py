@@ -0,0 +1,140 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import base64
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import rdflib
+
+from config import config
+from beacon_controller.const import Predicate
+from beacon_controller.controllers import statements_controller
+from beacon_controller.controllers.statements_controller import START_CURSOR, encode_cursor, decode_cursor
+from beacon_controller.providers import datasets, edges, graph, rhea
+from beacon_controller.providers.rhea import build_keyset_filter
+from swagger_server.test.rhea_sample import LocalProviderTestCase
+
+
+class TestCursor(unittest.TestCase):
+    """Statement cursor unit tests"""
+
+    def test_round_trip(self):
+        for predicate in Predicate:
+            cursor = encode_cursor(predicate, 'RHEA:10000', 'CHEBI:15377 "quoted"')
+            self.assertEqual(decode_cursor(cursor), (predicate, 'RHEA:10000', 'CHEBI:15377 "quoted"'))
+
+    def test_url_safe(self):
+        cursor = encode_cursor(Predicate.participates_in, 'ÿ' * 30, '?' * 30)
+        self.assertNotRegex(cursor, r'[+/]')
+
+    def test_start_cursor(self):
+        self.assertIsNone(decode_cursor(START_CURSOR))
+
+    def test_invalid_cursor(self):
+        unknown_predicate = base64.urlsafe_b64encode(b'["not_a_predicate", "a", "b"]').decode('ascii')
+        wrong_shape = base64.urlsafe_b64encode(b'["participates_in", "a"]').decode('ascii')
+        for cursor in ['garbage', '', unknown_predicate, wrong_shape]:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decode_cursor(cursor)
+
+
+class TestKeysetFilter(unittest.TestCase):
+    """build_keyset_filter unit tests, evaluated by rdflib"""
+
+    QUERY = """
+    PREFIX ex: <http://example.org/>
+    SELECT ?subjectId ?objectId
+    WHERE {{
+        ?subjectId ex:p ?objectId .
+        {}
+    }}
+    ORDER BY str(?subjectId) str(?objectId)
+    LIMIT {}
+    """
+
+    def setUp(self):
+        self.graph = rdflib.Graph()
+        ex = rdflib.Namespace('http://example.org/')
+        for s in ['a', 'b', 'b"c', 'd']:
+            for o in ['x', 'y', 'z']:
+                self.graph.add((ex[s], ex.p, ex[o]))
+
+    def page(self, after, size):
+        query = self.QUERY.format(build_keyset_filter(['subjectId', 'objectId'], after), size)
+        return [(str(s), str(o)) for s, o in self.graph.query(query)]
+
+    def test_no_values(self):
+        self.assertEqual(build_keyset_filter(['subjectId', 'objectId'], None), '')
+
+    def test_pages_resume_after_last_row(self):
+        everything = self.page(None, 100)
+        self.assertEqual(len(everything), 12)
+
+        for size in range(1, 6):
+            rows, after = [], None
+            while True:
+                page = self.page(after, size)
+                if page == []:
+                    break
+                rows.extend(page)
+                after = page[-1]
+            with self.subTest(size=size):
+                self.assertEqual(rows, everything)
+
+
+class TestRecordsPage(LocalProviderTestCase):
+    """Cursor paginated /statements records from the sample graph"""
+
+    def setUp(self):
+        super().setUp()
+
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+
+        patcher = mock.patch.dict(config['graph'], path=path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        graph.build(rhea.get_records, release='130').save(path)
+        datasets.invalidate('graph')
+        datasets.invalidate('edge_tables')
+        edges.save(edges.build(graph.load_graph()), edges.tables_path())
+
+    def pages(self, size, **kwargs):
+        rows, cursor = [], START_CURSOR
+        while cursor is not None:
+            records, cursor = statements_controller.get_records_page(size=size, cursor=cursor, **kwargs)
+            self.assertLessEqual(len(records), size)
+            rows.extend((r['edge_label']['value'], r['subjectId']['value'], r['objectId']['value']) for r in records)
+        return rows
+
+    def test_pages(self):
+        for edge_tables in [False, True]:
+            with mock.patch.dict(config['graph'], edge_tables=edge_tables):
+                records, cursor = statements_controller.get_records_page()
+                everything = [(r['edge_label']['value'], r['subjectId']['value'], r['objectId']['value']) for r in records]
+
+                self.assertIsNone(cursor)
+                self.assertGreater(len(everything), 20)
+                self.assertEqual(len(set(everything)), len(everything))
+
+                for size in [1, 4, 7, len(everything)]:
+                    with self.subTest(edge_tables=edge_tables, size=size):
+                        self.assertEqual(self.pages(size), everything)
+
+    def test_same_pages_with_edge_tables(self):
+        kwargs = dict(s=['CHEBI:1', 'CHEBI:4', 'EC:2.7.1.1'])
+        with mock.patch.dict(config['graph'], edge_tables=False):
+            expected = self.pages(3, **kwargs)
+        with mock.patch.dict(config['graph'], edge_tables=True):
+            self.assertEqual(self.pages(3, **kwargs), expected)
+        self.assertGreater(len(expected), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
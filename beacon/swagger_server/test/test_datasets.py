@@ -0,0 +1,144 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import threading
+import unittest
+from time import sleep
+from unittest import mock
+
+from beacon_controller.providers import datasets
+from beacon_controller.providers.datasets import Registry
+
+
+class TestRegistry(unittest.TestCase):
+    """Registry unit tests"""
+
+    def setUp(self):
+        self.registry = Registry()
+        self.calls = []
+
+    def register(self, name, value, preload=True):
+        def loader():
+            self.calls.append(name)
+            if isinstance(value, Exception):
+                raise value
+            return value
+        self.registry.register(name, loader, preload)
+
+    def test_loaded_once(self):
+        self.register('enzymes', {'1.1.1.1' : 'alcohol dehydrogenase'})
+
+        self.assertFalse(self.registry.is_loaded('enzymes'))
+        self.assertIs(self.registry.get('enzymes'), self.registry.get('enzymes'))
+        self.assertTrue(self.registry.is_loaded('enzymes'))
+        self.assertEqual(self.calls, ['enzymes'])
+
+    def test_concurrent_callers_share_one_load(self):
+        started = threading.Event()
+
+        def loader():
+            started.set()
+            sleep(0.1)
+            self.calls.append('slow')
+            return object()
+
+        self.registry.register('slow', loader)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.registry.get('slow'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(started.is_set())
+        self.assertEqual(self.calls, ['slow'])
+        self.assertEqual(len(set(map(id, results))), 1)
+
+    def test_unavailable_dataset_is_remembered(self):
+        self.register('compounds', None)
+
+        self.assertIsNone(self.registry.get('compounds'))
+        self.assertIsNone(self.registry.get('compounds'))
+        self.assertFalse(self.registry.is_loaded('compounds'))
+        self.assertEqual(self.calls, ['compounds'])
+
+    def test_failed_load_is_retried(self):
+        self.register('xrefs', Exception('missing'))
+
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                self.registry.get('xrefs')
+
+        self.assertEqual(self.calls, ['xrefs', 'xrefs'])
+
+    def test_invalidate(self):
+        self.register('graph', None)
+        self.register('enzymes', 1)
+
+        self.registry.get('graph')
+        self.registry.get('enzymes')
+        self.registry.invalidate('graph')
+        self.registry.get('graph')
+        self.registry.get('enzymes')
+        self.assertEqual(self.calls, ['graph', 'enzymes', 'graph'])
+
+        self.registry.invalidate()
+        self.registry.get('enzymes')
+        self.assertEqual(self.calls, ['graph', 'enzymes', 'graph', 'enzymes'])
+        self.assertNotIn('seconds', self.registry.stats()['graph'])
+
+    def test_preload(self):
+        preload = {'rdf' : False}
+        self.register('enzymes', 1)
+        self.register('graph', None, preload=False)
+        self.register('rdf', 2, preload=lambda: preload['rdf'])
+        self.register('xrefs', Exception('missing'))
+
+        with self.assertLogs(level='ERROR'):
+            self.registry.preload()
+        self.assertEqual(sorted(self.calls), ['enzymes', 'xrefs'])
+
+        preload['rdf'] = True
+        self.registry.preload()
+        self.assertIn('rdf', self.calls)
+        self.assertNotIn('graph', self.calls)
+
+    def test_stats(self):
+        self.register('enzymes', 1)
+        self.register('graph', None)
+        self.registry.get('enzymes')
+
+        stats = self.registry.stats()
+        self.assertTrue(stats['enzymes']['loaded'])
+        self.assertIn('seconds', stats['enzymes'])
+        self.assertEqual(stats['graph'], {'loaded' : False})
+
+
+class TestDataset(unittest.TestCase):
+    """dataset decorator unit tests"""
+
+    def test_decorator(self):
+        with mock.patch.object(datasets, 'registry', Registry()):
+            calls = []
+
+            @datasets.dataset('names', preload=False)
+            def load_names():
+                """The names"""
+                calls.append(1)
+                return ['water']
+
+            self.assertEqual(load_names(), ['water'])
+            self.assertEqual(load_names(), ['water'])
+            self.assertEqual(calls, [1])
+            self.assertEqual(load_names.__name__, 'load_names')
+            self.assertEqual(load_names.__doc__, 'The names')
+
+            datasets.invalidate('names')
+            load_names()
+            self.assertEqual(calls, [1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
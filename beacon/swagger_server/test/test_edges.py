@@ -0,0 +1,94 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from config import config
+from beacon_controller.const import Predicate
+from beacon_controller.controllers import statements_controller
+from beacon_controller.providers import datasets, edges, graph, rhea
+from swagger_server.test.rhea_sample import LocalProviderTestCase
+
+
+def statements(records) -> set:
+    keys = ['subjectId', 'subjectName', 'objectId', 'objectName', 'edge_label', 'relation', 'citations']
+    return {tuple(r[k]['value'] for k in keys if k in r) for r in records}
+
+
+class TestEdgeTables(LocalProviderTestCase):
+    """/statements records from the edge tables compared to those from SPARQL"""
+
+    def setUp(self):
+        super().setUp()
+
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+
+        patcher = mock.patch.dict(config['graph'], path=path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        graph.build(rhea.get_records, release='130').save(path)
+        datasets.invalidate('graph')
+        datasets.invalidate('edge_tables')
+        edges.save(edges.build(graph.load_graph()), edges.tables_path())
+
+    def compare(self, **kwargs):
+        with mock.patch.dict(config['graph'], edge_tables=False):
+            expected = statements(statements_controller.get_records(**kwargs))
+
+        with mock.patch.dict(config['graph'], edge_tables=True):
+            actual = statements(statements_controller.get_records(**kwargs))
+
+        self.assertEqual(actual, expected)
+        return actual
+
+    def test_tables_are_used(self):
+        with mock.patch.dict(config['graph'], edge_tables=True), mock.patch.object(rhea, 'get') as get:
+            self.assertGreater(len(statements_controller.get_records()), 0)
+        get.assert_not_called()
+
+    def test_predicates(self):
+        for predicate in Predicate:
+            with self.subTest(predicate=predicate.name):
+                self.assertGreater(len(self.compare(edge_label=predicate.edge_label, relation=predicate.relation)), 0)
+
+    def test_filters(self):
+        self.assertGreater(len(self.compare()), 0)
+        self.assertGreater(len(self.compare(s=['CHEBI:3'])), 0)
+        self.assertGreater(len(self.compare(t=['chebi:5', 'RHEA:10004'])), 0)
+        self.assertGreater(len(self.compare(s=['EC:2.7.1.1'], t=['CHEBI:2', 'CHEBI:4'])), 0)
+        self.assertGreater(len(self.compare(s_keywords=['glucose'], t_keywords=['ADP'])), 0)
+        self.assertEqual(self.compare(s=['CHEBI:99']), set())
+
+    def test_citations(self):
+        records = self.compare(s=['CHEBI:2'], t=['CHEBI:3'], edge_label='derives_into', get_citations=True)
+        self.assertEqual(len(records), 1)
+
+        citations = records.pop()[-1]
+        self.assertEqual(sorted(citations.split('|')), [
+            'http://rdf.ncbi.nlm.nih.gov/pubmed/100',
+            'http://rdf.ncbi.nlm.nih.gov/pubmed/101',
+        ])
+
+    def test_rows(self):
+        tables = edges.load_edge_tables()
+        table = tables[Predicate.derives_into]
+        g = graph.load_graph()
+        chebi_4 = g.node_index(Predicate.derives_into.domain, 'CHEBI:4')
+        chebi_5 = g.node_index(Predicate.derives_into.codomain, 'CHEBI:5')
+
+        subject_rows = list(table.rows_for_subject(chebi_4))
+        object_rows = list(table.rows_for_object(chebi_5))
+
+        self.assertEqual({int(table.subjects[i]) for i in subject_rows}, {chebi_4})
+        self.assertEqual({int(table.objects[i]) for i in object_rows}, {chebi_5})
+        self.assertEqual(len(set(subject_rows) & set(object_rows)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
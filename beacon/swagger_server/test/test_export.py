@@ -0,0 +1,126 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import unittest
+from unittest import mock
+
+import tornado.web
+from flask import Flask
+from tornado.testing import AsyncHTTPTestCase
+
+from config import config
+from beacon_controller.controllers import export_controller, statements_controller
+from swagger_server.models.beacon_statement_subject import BeaconStatementSubject
+from swagger_server.test.rhea_sample import LocalProviderTestCase
+
+
+class TestParseArguments(unittest.TestCase):
+    """parse_arguments unit tests"""
+
+    def parse(self, **args):
+        return export_controller.parse_arguments(lambda name: args.get(name, []))
+
+    def test_arrays(self):
+        kwargs = self.parse(s=['CHEBI:1,CHEBI:2', ' CHEBI:3 '], t_keywords=['glucose,', ''], edge_label=['derives_into', 'participates_in'])
+
+        self.assertEqual(kwargs['s'], ['CHEBI:1', 'CHEBI:2', 'CHEBI:3'])
+        self.assertEqual(kwargs['t_keywords'], ['glucose'])
+        self.assertEqual(kwargs['edge_label'], 'derives_into')
+        self.assertIsNone(kwargs['t'])
+        self.assertIsNone(kwargs['relation'])
+        self.assertNotIn('size', kwargs)
+
+    def test_size(self):
+        self.assertEqual(self.parse(size=['10'])['size'], 10)
+        with self.assertRaises(ValueError):
+            self.parse(size=['ten'])
+
+    def test_serialize(self):
+        lines = export_controller.serialize([
+            BeaconStatementSubject(id='CHEBI:1', name='water'),
+            BeaconStatementSubject(id='CHEBI:2', name='ATP\nadenosine 5\'-triphosphate'),
+        ]).split('\n')
+
+        self.assertEqual(lines[-1], '')
+        self.assertEqual([json.loads(line) for line in lines[:-1]], [
+            {'id' : 'CHEBI:1', 'name' : 'water'},
+            {'id' : 'CHEBI:2', 'name' : 'ATP\nadenosine 5\'-triphosphate'},
+        ])
+
+
+class ExportTestCase(LocalProviderTestCase):
+    """Exports statements of the sample graph in batches of 4"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(config['statements'], stream_batch_size=4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expected(self, **kwargs):
+        statements = statements_controller.iter_statements(**kwargs)
+        return [json.loads(export_controller.serialize([statement])) for statement in statements]
+
+    def parse(self, body:str):
+        self.assertTrue(body.endswith('\n'))
+        return [json.loads(line) for line in body.splitlines()]
+
+
+class TestStatementsStream(ExportTestCase):
+    """The Flask view of the export"""
+
+    def setUp(self):
+        super().setUp()
+        app = Flask(__name__)
+        app.add_url_rule('/statements/stream', 'statements_stream', export_controller.get_statements_stream)
+        self.client = app.test_client()
+
+    def test_stream(self):
+        response = self.client.get('/statements/stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, export_controller.MIMETYPE)
+
+        statements = self.parse(response.get_data(as_text=True))
+        self.assertGreater(len(statements), 20)
+        self.assertEqual(statements, self.expected())
+        self.assertEqual(len({s['id'] for s in statements}), len(statements))
+
+    def test_query(self):
+        response = self.client.get('/statements/stream?s=CHEBI:4,CHEBI:1&edge_label=derives_into&size=3')
+        statements = self.parse(response.get_data(as_text=True))
+        self.assertEqual(statements, self.expected(s=['CHEBI:4', 'CHEBI:1'], edge_label='derives_into', size=3))
+        self.assertEqual(len(statements), 3)
+
+    def test_invalid_size(self):
+        self.assertEqual(self.client.get('/statements/stream?size=all').status_code, 400)
+
+
+class TestStatementsStreamHandler(ExportTestCase, AsyncHTTPTestCase):
+    """The native Tornado handler of the export"""
+
+    def setUp(self):
+        ExportTestCase.setUp(self)
+        AsyncHTTPTestCase.setUp(self)
+
+    def get_app(self):
+        return tornado.web.Application([('/statements/stream', export_controller.StatementsStreamHandler)])
+
+    def test_stream(self):
+        with mock.patch.object(statements_controller, 'get_statements_page', wraps=statements_controller.get_statements_page) as get_page:
+            response = self.fetch('/statements/stream?t_categories=chemical%20substance')
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['Content-Type'], export_controller.MIMETYPE)
+
+        statements = self.parse(response.body.decode('utf-8'))
+        self.assertEqual(statements, self.expected(t_categories=['chemical substance']))
+        self.assertGreater(get_page.call_count, 2)
+
+    def test_invalid_size(self):
+        self.assertEqual(self.fetch('/statements/stream?size=-').code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
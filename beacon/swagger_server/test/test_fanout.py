@@ -0,0 +1,103 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import threading
+import unittest
+from time import sleep, time
+from unittest import mock
+
+from config import config
+from beacon_controller.const import Predicate
+from beacon_controller.controllers import statements_controller
+from beacon_controller.providers import rhea
+from swagger_server.test.rhea_sample import LocalProviderTestCase
+
+
+def rows(records) -> list:
+    return [tuple(sorted((k, v['value']) for k, v in r.items())) for r in records]
+
+
+class TestFanout(LocalProviderTestCase):
+    """Per predicate queries compared to the single UNION query"""
+
+    def get_records(self, fanout, **kwargs):
+        with mock.patch.dict(config['statements'], fanout=fanout):
+            return rows(statements_controller.get_records(**kwargs))
+
+    def test_pages(self):
+        everything = self.get_records(False, size=1000, offset=0)
+        self.assertGreater(len(everything), 20)
+
+        for size, offset in [(1000, 0), (5, 0), (5, 3), (7, 20), (10, len(everything) - 4)]:
+            with self.subTest(size=size, offset=offset):
+                page = self.get_records(True, size=size, offset=offset)
+                self.assertEqual(page, self.get_records(False, size=size, offset=offset))
+                self.assertEqual(page, everything[offset:offset + size])
+
+    def test_filters(self):
+        for kwargs in [dict(s=['CHEBI:1', 'CHEBI:3']), dict(t=['RHEA:10004'], size=3, offset=1), dict(s_keywords=['glucose'], get_citations=True)]:
+            with self.subTest(**kwargs):
+                kwargs = dict(dict(size=100), **kwargs)
+                self.assertEqual(self.get_records(True, **kwargs), self.get_records(False, **kwargs))
+
+    def test_one_query_per_predicate(self):
+        with mock.patch.object(rhea, 'get_records', wraps=rhea.get_records) as get_records:
+            self.get_records(True, size=10)
+        self.assertEqual(get_records.call_count, len(Predicate))
+
+    def test_deep_pages_use_a_union(self):
+        with mock.patch.dict(config['statements'], fanout_max_rows=10), mock.patch.object(rhea, 'get_records', wraps=rhea.get_records) as get_records:
+            self.get_records(True, size=5, offset=6)
+        self.assertEqual(get_records.call_count, 1)
+
+
+class TestFanoutFailures(LocalProviderTestCase):
+    """Branches that time out or fail are left out of the page"""
+
+    def setUp(self):
+        super().setUp()
+        self.released = threading.Event()
+        self.addCleanup(self.released.set)
+
+    def get_records(self, branch):
+        get_records = rhea.get_records
+
+        def wrapper(q):
+            if '"derives_into" AS ?edge_label' in q:
+                return branch(q)
+            return get_records(q)
+
+        with mock.patch.dict(config['statements'], fanout=True, branch_timeout=0.5), mock.patch.object(rhea, 'get_records', side_effect=wrapper) as mocked:
+            records = statements_controller.get_records(size=100)
+
+        return records, mocked.call_count
+
+    def test_slow_branch(self):
+        def slow(q):
+            self.released.wait(10)
+            return []
+
+        start = time()
+        records, calls = self.get_records(slow)
+
+        self.assertLess(time() - start, 5)
+        self.assertGreater(len(records), 0)
+        self.assertNotIn('derives_into', {r['edge_label']['value'] for r in records})
+        # The page isn't fetched again with a UNION query
+        self.assertEqual(calls, len(Predicate))
+
+    def test_failing_branch(self):
+        def failing(q):
+            sleep(0.05)
+            raise Exception('The endpoint returned 500')
+
+        records, calls = self.get_records(failing)
+
+        self.assertGreater(len(records), 0)
+        self.assertNotIn('derives_into', {r['edge_label']['value'] for r in records})
+        self.assertEqual(calls, len(Predicate))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+from beacon_controller.const import Category, Predicate
+from beacon_controller.providers import graph, rhea
+from beacon_controller.providers.graph import RheaGraph, StringTable
+from swagger_server.test.rhea_sample import LocalProviderTestCase
+
+
+class TestStringTable(unittest.TestCase):
+    """StringTable unit tests"""
+
+    def test_lookup(self):
+        table = StringTable.from_strings(['CHEBI:1', 'CHEBI:10', 'CHEBI:2', 'RHEA:10000'])
+
+        self.assertEqual(len(table), 4)
+        self.assertEqual(list(table), ['CHEBI:1', 'CHEBI:10', 'CHEBI:2', 'RHEA:10000'])
+        self.assertEqual(table.index('CHEBI:2'), 2)
+        self.assertIsNone(table.index('CHEBI:3'))
+        self.assertEqual(table.lower_bound('CHEBI:3'), 3)
+
+    def test_unicode(self):
+        table = StringTable.from_strings(['α-D-glucose', 'β-D-glucose'])
+        self.assertEqual(table[1], 'β-D-glucose')
+        self.assertEqual(table.index('α-D-glucose'), 0)
+
+
+class TestRheaGraph(LocalProviderTestCase):
+    """The graph snapshot compared to the SPARQL queries it stands in for"""
+
+    def setUp(self):
+        super().setUp()
+
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+
+        graph.build(rhea.get_records, release='130').save(path)
+        self.graph = RheaGraph.load(path)
+
+    def test_edges(self):
+        for predicate in Predicate:
+            with self.subTest(predicate=predicate.name):
+                records = rhea.get_records(f"""
+                PREFIX rh:<http://rdf.rhea-db.org/>
+                SELECT ?subjectId ?objectId WHERE {{ {predicate.sparql} }}
+                """)
+                expected = Counter((r['subjectId']['value'], r['objectId']['value']) for r in records)
+
+                edges = self.graph.edges(predicate)
+                actual = Counter(
+                    (self.graph.node_id(predicate.domain, s), self.graph.node_id(predicate.codomain, o))
+                    for s, o in zip(edges.subjects, edges.objects)
+                )
+
+                self.assertGreater(len(expected), 0)
+                self.assertEqual(actual, expected)
+
+    def test_obsolete_reactions_are_left_out(self):
+        self.assertEqual(list(self.graph.reaction_accessions), ['RHEA:10000', 'RHEA:10004', 'RHEA:10012'])
+
+    def test_nodes(self):
+        i = self.graph.node_index(Category.chemical_substance, 'chebi:4')
+        self.assertEqual(self.graph.node_name(Category.chemical_substance, i), 'D-glucose')
+
+        i = self.graph.node_index(Category.protein, 'EC:3.1.3.9')
+        self.assertEqual(self.graph.node_id(Category.protein, i), 'http://purl.uniprot.org/enzyme/3.1.3.9')
+
+        self.assertIsNone(self.graph.node_index(Category.protein, 'CHEBI:4'))
+        self.assertIsNone(self.graph.node_index(Category.molecular_activity, 'RHEA:10008'))
+
+    def test_citations(self):
+        i = self.graph.node_index(Category.molecular_activity, 'RHEA:10000')
+        self.assertEqual(self.graph.citations_of(i), [
+            'http://rdf.ncbi.nlm.nih.gov/pubmed/100',
+            'http://rdf.ncbi.nlm.nih.gov/pubmed/101',
+        ])
+        self.assertEqual(self.graph.release, '130')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+from collections import Counter
+from unittest import mock
+
+from config import config
+from beacon_controller.const import Predicate
+from beacon_controller.controllers import statements_controller
+from beacon_controller.providers import local, rhea, transport
+from swagger_server.test.rhea_sample import LocalProviderTestCase
+
+
+def pairs(records) -> Counter:
+    return Counter((r['subjectId']['value'], r['objectId']['value']) for r in records)
+
+
+class TestRewrite(unittest.TestCase):
+    """local.rewrite unit tests"""
+
+    def test_literal_objects(self):
+        q = local.rewrite('?side1 rh:curatedOrder 1 .\n?side2 rh:curatedOrder 2 .')
+        self.assertEqual(q, (
+            '?side1 rh:curatedOrder ?literal1 . FILTER (?literal1 = 1) .\n'
+            '?side2 rh:curatedOrder ?literal2 . FILTER (?literal2 = 2) .'
+        ))
+
+    def test_iri_comparison(self):
+        self.assertEqual(local.rewrite('FILTER (?reaction1 < ?reaction2) .'), 'FILTER (str(?reaction1) < str(?reaction2)) .')
+
+    def test_other_patterns_are_kept(self):
+        q = '?reaction rh:accession "RHEA:10000" . FILTER (?p1 != ?p2) .'
+        self.assertEqual(local.rewrite(q), q)
+
+    def test_remote_queries_are_not_rewritten(self):
+        response = mock.Mock(ok=True, content=b'{}')
+        response.json.return_value = {'results' : {'bindings' : []}}
+
+        with mock.patch.dict(config, provider='remote'), mock.patch.object(transport, 'get', return_value=response) as get:
+            rhea.fetch(Predicate.derives_into.sparql)
+
+        self.assertIn('?side1 rh:curatedOrder 1 .', get.call_args[1]['params']['query'])
+
+
+class TestLocalProvider(LocalProviderTestCase):
+    """Predicate queries answered by the local provider"""
+
+    def records(self, predicate):
+        return statements_controller.get_records(edge_label=predicate.edge_label, relation=predicate.relation, size=100)
+
+    def test_derives_into(self):
+        self.assertEqual(pairs(self.records(Predicate.derives_into)), Counter([
+            ('CHEBI:2', 'CHEBI:3'), ('CHEBI:2', 'CHEBI:5'), ('CHEBI:4', 'CHEBI:3'), ('CHEBI:4', 'CHEBI:5'),
+            ('CHEBI:3', 'CHEBI:2'), ('CHEBI:1', 'CHEBI:2'),
+            ('CHEBI:4', 'CHEBI:5'), ('CHEBI:1', 'CHEBI:5'),
+        ]))
+
+    def test_increases_synthesis_of(self):
+        self.assertEqual(pairs(self.records(Predicate.increases_synthesis_of)), Counter([
+            ('http://purl.uniprot.org/enzyme/2.7.1.1', 'CHEBI:3'),
+            ('http://purl.uniprot.org/enzyme/2.7.1.1', 'CHEBI:5'),
+            ('http://purl.uniprot.org/enzyme/2.7.1.1', 'CHEBI:2'),
+            ('http://purl.uniprot.org/enzyme/3.1.3.9', 'CHEBI:2'),
+        ]))
+
+    def test_has_same_catalyst(self):
+        records = self.records(Predicate.has_same_catalyst)
+        self.assertEqual(pairs(records), Counter([('RHEA:10000', 'RHEA:10004')]))
+        self.assertEqual(records[0]['subjectName']['value'], 'ATP + D-glucose = ADP + D-glucose 6-phosphate')
+
+    def test_catalyzes_same_reaction(self):
+        self.assertEqual(pairs(self.records(Predicate.catalyzes_same_reaction)), Counter([
+            ('http://purl.uniprot.org/enzyme/2.7.1.1', 'http://purl.uniprot.org/enzyme/3.1.3.9'),
+        ]))
+
+    def test_obsolete_reactions_are_left_out(self):
+        self.assertEqual(pairs(self.records(Predicate.increases_activity_of)), Counter([
+            ('http://purl.uniprot.org/enzyme/2.7.1.1', 'RHEA:10000'),
+            ('http://purl.uniprot.org/enzyme/2.7.1.1', 'RHEA:10004'),
+            ('http://purl.uniprot.org/enzyme/3.1.3.9', 'RHEA:10004'),
+        ]))
+
+    def test_grouped_query_without_solutions(self):
+        records = statements_controller.get_records(s=['CHEBI:99'], edge_label='derives_into', size=1, get_citations=True)
+        self.assertEqual(records, [])
+
+    def test_statements(self):
+        statements = statements_controller.get_statements(s=['CHEBI:1'], edge_label='participates_in')
+        self.assertEqual(sorted(s.object.id for s in statements), ['RHEA:10004', 'RHEA:10012'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import contextlib
+import io
+import json
+import os
+import runpy
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import data
+from config import config
+from beacon_controller.providers import pubmed
+from swagger_server.test.rhea_sample import LocalProviderTestCase
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patchers = [
+            mock.patch.object(pubmed, 'time', self.clock.time),
+            mock.patch.object(pubmed, 'sleep', self.clock.sleep),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def acquire(self, limiter, n):
+        """Returns the (fake) time at which each acquisition returned"""
+        times = []
+        for _ in range(n):
+            limiter.acquire()
+            times.append(self.clock.now - 1000.0)
+        return times
+
+
+class TestTokenBucket(RateLimiterTestCase):
+    """TokenBucket unit tests"""
+
+    def test_rate(self):
+        bucket = pubmed.TokenBucket(rate=4, capacity=1)
+        self.assertEqual(self.acquire(bucket, 5), [0, 0.25, 0.5, 0.75, 1.0])
+
+    def test_burst(self):
+        bucket = pubmed.TokenBucket(rate=2, capacity=3)
+        self.assertEqual(self.acquire(bucket, 5), [0, 0, 0, 0.5, 1.0])
+
+    def test_refill(self):
+        bucket = pubmed.TokenBucket(rate=2, capacity=3)
+        self.acquire(bucket, 3)
+        self.clock.now += 10
+        self.assertEqual(self.clock.sleeps, [])
+        self.acquire(bucket, 3)
+        self.assertEqual(self.clock.sleeps, [])
+        self.acquire(bucket, 1)
+        self.assertEqual(self.clock.sleeps, [0.5])
+
+
+class TestSharedRateLimiter(RateLimiterTestCase):
+    """SharedRateLimiter unit tests"""
+
+    def setUp(self):
+        super().setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def test_limiters_share_the_rate(self):
+        """Limiters opened on the same file, as by separate processes"""
+        path = os.path.join(self.path, 'pubmed.sqlite')
+        first = pubmed.SharedRateLimiter(path, rate=4)
+        second = pubmed.SharedRateLimiter(path, rate=4)
+
+        times = self.acquire(first, 2) + self.acquire(second, 2) + self.acquire(first, 1)
+        self.assertEqual(times, [0, 0.25, 0.5, 0.75, 1.0])
+
+    def test_idle_limiter_does_not_wait(self):
+        limiter = pubmed.SharedRateLimiter(os.path.join(self.path, 'pubmed.sqlite'), rate=4)
+        self.acquire(limiter, 1)
+        self.clock.now += 5
+        self.acquire(limiter, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class EsummaryHandler(BaseHTTPRequestHandler):
+    """
+    Answers esummary requests with a summary for each id, except that a chunk
+    containing 500 fails and one containing 666 gets an HTML page.
+    """
+
+    def do_GET(self):
+        ids = parse_qs(urlparse(self.path).query)['id'][0].split(',')
+        self.server.requests.append(ids)
+
+        if '500' in ids:
+            self.respond(500, 'text/plain', b'Internal Server Error')
+        elif '666' in ids:
+            self.respond(200, 'text/html', b'<html><body>Service unavailable</body></html>')
+        else:
+            result = {pmid : {'uid' : pmid, 'title' : f'Article {pmid}', 'pubdate' : '2019 Jan'} for pmid in ids}
+            result['uids'] = ids
+            self.respond(200, 'application/json', json.dumps({'result' : result}).encode('utf-8'))
+
+    def respond(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PubMedTestCase(unittest.TestCase):
+    """Fetches summaries from a local esummary stub into a fresh cache"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+        self.server = StubServer(('127.0.0.1', 0), EsummaryHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        patchers = [
+            mock.patch.dict(config['pubmed'], base_url=f'http://127.0.0.1:{self.server.server_port}/esummary.fcgi', offline=False, rate=1000, api_key=None, chunk_size=2, cache=True, cache_path=os.path.join(self.path, 'pubmed.sqlite'), cache_ttl=None),
+            mock.patch.object(pubmed, 'limiter', None),
+            mock.patch.object(pubmed, 'summary_cache', None),
+            mock.patch.object(pubmed, 'executor', None),
+            mock.patch.dict(os.environ, NO_PROXY='127.0.0.1', no_proxy='127.0.0.1'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.client = pubmed.PubMedRetreiver(email='test@example.org')
+
+    def requested(self):
+        return sorted(pmid for ids in self.server.requests for pmid in ids)
+
+
+class TestPubMedRetreiver(PubMedTestCase):
+    """PubMedRetreiver tests"""
+
+    def test_fetched_once(self):
+        summaries = self.client.get(['PMID:1', 'http://rdf.ncbi.nlm.nih.gov/pubmed/2', '3', 'pubmed:1'])
+
+        self.assertEqual(sorted(summaries), ['1', '2', '3'])
+        self.assertEqual(summaries['2']['title'], 'Article 2')
+        self.assertEqual(self.requested(), ['1', '2', '3'])
+        self.assertEqual(len(self.server.requests), 2)
+
+        self.assertEqual(self.client.get(['3', '4']), {'3' : summaries['3'], '4' : mock.ANY})
+        self.assertEqual(self.requested(), ['1', '2', '3', '4'])
+
+    def test_failed_request(self):
+        with self.assertLogs(level='WARNING'):
+            summaries = self.client.get(['1', '500', '2', '3'])
+
+        self.assertEqual(sorted(summaries), ['2', '3'])
+        self.assertEqual(pubmed.get_summary_cache().get_many(['1', '2', '3', '500']).keys(), {'2', '3'})
+
+    def test_malformed_response(self):
+        with self.assertLogs(level='WARNING'):
+            summaries = self.client.get(['1', '666', '2'])
+
+        self.assertEqual(sorted(summaries), ['2'])
+
+    def test_unreachable(self):
+        with mock.patch.dict(config['pubmed'], base_url='http://127.0.0.1:1/esummary.fcgi'), self.assertLogs(level='WARNING'):
+            self.assertEqual(self.client.get(['1']), {})
+
+
+class TestOffline(PubMedTestCase):
+    """Summaries served from the local store only"""
+
+    def test_offline(self):
+        self.client.get(['1', '2'])
+        requests = len(self.server.requests)
+
+        with mock.patch.dict(config['pubmed'], offline=True), self.assertLogs(level='WARNING'):
+            summaries = self.client.get(['1', '2', '3'])
+
+        self.assertEqual(sorted(summaries), ['1', '2'])
+        self.assertEqual(len(self.server.requests), requests)
+
+
+class TestBuildPubMed(LocalProviderTestCase, PubMedTestCase):
+    """data/build_pubmed.py run against the sample graph"""
+
+    def setUp(self):
+        LocalProviderTestCase.setUp(self)
+        PubMedTestCase.setUp(self)
+
+    def build(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(os.path.join(data.path, 'build_pubmed.py'))
+
+    def test_build(self):
+        self.build()
+        self.assertEqual(self.requested(), ['100', '101', '102'])
+
+        with mock.patch.dict(config['pubmed'], offline=True):
+            summaries = self.client.get(['100', '101', '102'])
+        self.assertEqual(sorted(summaries), ['100', '101', '102'])
+
+        # Stored summaries aren't downloaded again
+        self.build()
+        self.assertEqual(self.requested(), ['100', '101', '102'])
+
+
+if __name__ == '__main__':
+    unittest.main()
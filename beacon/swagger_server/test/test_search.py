@@ -0,0 +1,77 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from beacon_controller.providers.search import SearchIndex, search
+
+
+class TestSearchIndex(unittest.TestCase):
+    """SearchIndex unit tests"""
+
+    df = pd.DataFrame({
+        'id': ['CHEBI:1', 'CHEBI:2', 'CHEBI:3', 'CHEBI:4', 'CHEBI:5', 'CHEBI:6', 'CHEBI:6'],
+        'name': ['water', 'hydrogen peroxide', 'L-glutamate', 'D-Glucose 6-phosphate', np.nan, 'glucose', 'Glucose'],
+        'synonyms': ['H2O;oxidane', 'H2O2', 'glutamic acid', np.nan, 'alpha-D-glucose', 'dextrose', 'dextrose'],
+    })
+
+    columns = ['name', 'synonyms']
+
+    def contains(self, keywords):
+        """The rows matched by the str.contains scan the index replaced"""
+        q = pd.Series(False, index=self.df.index)
+        for column in self.columns:
+            for keyword in keywords:
+                q |= self.df[column].str.contains(keyword, case=False, regex=False).fillna(False).astype(bool)
+        return sorted(self.df[q].id.tolist())
+
+    def test_matches_str_contains(self):
+        index = SearchIndex(self.df, self.columns)
+        for keywords in [['glu'], ['GLUCOSE'], ['h2o'], ['o'], ['e 6-p'], ['water', 'acid'], ['xyz'], ['glucose 6'], ['é']]:
+            with self.subTest(keywords=keywords):
+                self.assertEqual(sorted(r['id'] for r in index.search(keywords)), self.contains(keywords))
+
+    def test_no_keywords(self):
+        index = SearchIndex(self.df, self.columns)
+        self.assertEqual(len(index.search([])), len(self.df))
+
+    def test_ranking(self):
+        index = SearchIndex(self.df, self.columns)
+        records = index.search(['glucose'])
+        self.assertEqual([r['name'] for r in records[:2]], ['glucose', 'Glucose'])
+        self.assertEqual(sorted(r['id'] for r in records[2:]), ['CHEBI:4', 'CHEBI:5'])
+
+    def test_column_multiplier(self):
+        index = SearchIndex(self.df, self.columns)
+        records = index.search(['glucose'], column_multiplier={'synonyms': 100})
+        self.assertEqual(records[0]['id'], 'CHEBI:5')
+
+    def test_top_k_selection(self):
+        index = SearchIndex(self.df, self.columns)
+        ranked = index.search(['o'])
+        for offset, size in [(0, 1), (0, 3), (2, 3), (5, 10)]:
+            with self.subTest(offset=offset, size=size):
+                self.assertEqual(index.search(['o'], offset=offset, size=size), ranked[offset:offset + size])
+
+    def test_unique_columns(self):
+        records = SearchIndex(self.df, self.columns, unique_columns='id').search(['glucose'])
+        self.assertEqual(sorted(r['id'] for r in records), ['CHEBI:4', 'CHEBI:5', 'CHEBI:6'])
+
+    def test_paging(self):
+        index = SearchIndex(self.df, self.columns)
+        everything, total = index.search(['e'], metadata=True)
+        self.assertEqual(total, len(everything))
+        self.assertEqual(index.search(['e'], offset=1, size=2), everything[1:3])
+
+    def test_search(self):
+        records = search(self.df, 'name', 'water')
+        self.assertEqual([r['id'] for r in records], ['CHEBI:1'])
+        self.assertEqual(search(self.df, ['name'], ['water']), records)
+
+
+if __name__ == '__main__':
+    unittest.main()
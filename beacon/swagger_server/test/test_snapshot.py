@@ -0,0 +1,130 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from time import sleep
+from unittest import mock
+
+from config import config
+from beacon_controller.providers import snapshot
+from beacon_controller.providers.snapshot import Snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+    """Snapshot unit tests"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+        self.release = '130'
+        self.calls = []
+
+        patchers = [
+            mock.patch.dict(config['snapshots'], path=self.path, max_age=3600),
+            mock.patch.object(snapshot, 'get_release', lambda wait=False: self.release),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def compute(self):
+        self.calls.append(self.release)
+        return {'derives_into' : len(self.calls)}
+
+    def test_computed_once(self):
+        s = Snapshot('counts', self.compute)
+
+        self.assertEqual(s.get(), {'derives_into' : 1})
+        self.assertEqual(s.get(), {'derives_into' : 1})
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'counts.json')))
+
+        # Another process reads the file instead of computing the value
+        self.assertEqual(Snapshot('counts', self.compute).get(), {'derives_into' : 1})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_reloaded_when_written_by_another_process(self):
+        s = Snapshot('counts', self.compute)
+        s.get()
+
+        other = Snapshot('counts', lambda: {'derives_into' : 10})
+        other.refresh(max_age=0)
+        os.utime(other.path, (s.mtime + 10, s.mtime + 10))
+
+        self.assertEqual(s.get(), {'derives_into' : 10})
+
+    def test_stale_value_is_served_while_refreshing(self):
+        s = Snapshot('counts', self.compute)
+        s.get()
+
+        computing = threading.Event()
+        finish = threading.Event()
+        self.addCleanup(finish.set)
+
+        def slow():
+            computing.set()
+            finish.wait(10)
+            return self.compute()
+
+        s.compute = slow
+        self.release = '131'
+
+        self.assertEqual(s.get(), {'derives_into' : 1})
+        self.assertTrue(computing.wait(5))
+        self.assertEqual(s.get(), {'derives_into' : 1})
+
+        finish.set()
+        for _ in range(100):
+            if s.value == {'derives_into' : 2}:
+                break
+            sleep(0.05)
+        self.assertEqual(s.get(), {'derives_into' : 2})
+        self.assertEqual(s.release, '131')
+
+    def test_unknown_release(self):
+        s = Snapshot('counts', self.compute)
+        s.get()
+
+        self.release = snapshot.UNKNOWN
+        self.assertFalse(s.is_stale())
+
+    def test_incomplete_value_is_stale(self):
+        s = Snapshot('counts', self.compute, complete=lambda value: value['derives_into'] > 1)
+        s.get()
+        self.assertTrue(s.is_stale())
+
+    @unittest.skipIf(snapshot.fcntl is None, 'file locks are not available')
+    def test_computed_by_one_process(self):
+        log = os.path.join(self.path, 'computed.log')
+
+        def compute():
+            with open(log, 'a') as f:
+                f.write(f'{os.getpid()}\n')
+            sleep(0.3)
+            return {'derives_into' : 42}
+
+        def worker(queue):
+            queue.put(Snapshot('counts', compute).get())
+
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [context.Process(target=worker, args=(queue,)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        results = [queue.get(timeout=30) for _ in processes]
+        for process in processes:
+            process.join(30)
+
+        self.assertEqual(results, [{'derives_into' : 42}] * 4)
+        with open(log) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import unittest
+
+from beacon_controller.providers.sparql_json import BindingsParser, iter_bindings
+
+
+def split(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestBindingsParser(unittest.TestCase):
+    """BindingsParser unit tests"""
+
+    bindings = [
+        {'x': {'type': 'literal', 'value': 'café € \U0001d11e "quoted" \\ ,]}'}},
+        {'x': {'type': 'uri', 'value': 'http://rdf.rhea-db.org/10000'}},
+        {'x': {'type': 'literal', 'value': '42', 'datatype': 'http://www.w3.org/2001/XMLSchema#integer'}},
+    ]
+
+    def document(self, **kwargs):
+        doc = {'head': {'vars': ['x']}, 'results': {'distinct': False, 'bindings': self.bindings}}
+        return json.dumps(doc, **kwargs).encode('utf-8')
+
+    def test_whole_body(self):
+        parser = BindingsParser([self.document()])
+        self.assertEqual(list(parser), self.bindings)
+        self.assertEqual(parser.head, {'vars': ['x']})
+
+    def test_split_chunks(self):
+        """Every chunk size, so that each token is split at every position"""
+        for kwargs in [{}, {'indent': 2}, {'ensure_ascii': False}]:
+            body = self.document(**kwargs)
+            for size in range(1, 40):
+                with self.subTest(kwargs=kwargs, size=size):
+                    self.assertEqual(list(iter_bindings(split(body, size))), self.bindings)
+
+    def test_multibyte_characters_across_chunks(self):
+        body = self.document(ensure_ascii=False)
+        position = body.index('\U0001d11e'.encode('utf-8'))
+        for i in range(1, 4):
+            chunks = [body[:position + i], body[position + i:]]
+            with self.subTest(i=i):
+                self.assertEqual(list(iter_bindings(chunks)), self.bindings)
+
+    def test_number_at_chunk_edge(self):
+        body = b'{"results": {"count": 12345, "bindings": [{"n": 1}]}, "head": {"vars": ["n"]}}'
+        position = body.index(b'12345')
+        for i in range(1, 5):
+            parser = BindingsParser([body[:position + i], body[position + i:]])
+            with self.subTest(i=i):
+                self.assertEqual(list(parser), [{'n': 1}])
+                self.assertEqual(parser.head, {'vars': ['n']})
+
+    def test_empty_bindings(self):
+        self.assertEqual(list(iter_bindings([b'{"head": {"vars": []}, "results": {"bindings": []}}'])), [])
+        self.assertEqual(list(iter_bindings([b'{"head": {}, "boolean": true}'])), [])
+
+    def test_truncated_body(self):
+        body = self.document()
+        with self.assertRaises(ValueError):
+            list(iter_bindings(split(body[:-10], 7)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import threading
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from config import config
+from beacon_controller.controllers import warmup_controller
+
+
+class TestWarmUp(unittest.TestCase):
+    """Warm-up and readiness endpoint tests"""
+
+    def setUp(self):
+        self.calls = []
+        self.release = threading.Event()
+
+        def step(name):
+            def run():
+                self.calls.append(name)
+            return run
+
+        def blocked():
+            self.release.wait(10)
+            self.calls.append('blocked')
+
+        def failing():
+            raise Exception('The endpoint returned 500')
+
+        steps = [
+            ('release', 'release', step('release')),
+            ('datasets', 'datasets', blocked),
+            ('search_indexes', 'search_indexes', failing),
+            ('metadata', 'namespaces', step('namespaces')),
+        ]
+
+        patchers = [
+            mock.patch.object(warmup_controller, 'STEPS', steps),
+            mock.patch.object(warmup_controller, 'ready', threading.Event()),
+            mock.patch.object(warmup_controller, 'status', {'started_at' : None, 'finished_at' : None, 'steps' : {}}),
+            mock.patch.dict(config['warmup'], enabled=True, release=True, datasets=True, search_indexes=True, metadata=True),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.release.set)
+
+        app = Flask(__name__)
+        app.add_url_rule('/ready', 'ready', warmup_controller.get_readiness)
+        self.client = app.test_client()
+
+    def test_readiness(self):
+        warmup_controller.start()
+
+        response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.get_json()['ready'])
+
+        self.release.set()
+        self.assertTrue(warmup_controller.ready.wait(5))
+
+        response = self.client.get('/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()['ready'])
+        self.assertIn('datasets', response.get_json())
+
+    def test_steps(self):
+        self.release.set()
+        with self.assertLogs(level='ERROR'):
+            warmup_controller.warm_up()
+
+        self.assertEqual(self.calls, ['release', 'blocked', 'namespaces'])
+        self.assertTrue(warmup_controller.ready.is_set())
+
+        steps = warmup_controller.status['steps']
+        self.assertEqual(steps['search_indexes']['error'], 'The endpoint returned 500')
+        self.assertNotIn('error', steps['namespaces'])
+        self.assertIsNotNone(warmup_controller.status['finished_at'])
+
+    def test_disabled_steps(self):
+        self.release.set()
+        with mock.patch.dict(config['warmup'], datasets=False, search_indexes=False):
+            warmup_controller.warm_up()
+
+        self.assertEqual(self.calls, ['release', 'namespaces'])
+        self.assertNotIn('datasets', warmup_controller.status['steps'])
+
+    def test_disabled(self):
+        with mock.patch.dict(config['warmup'], enabled=False):
+            warmup_controller.start()
+
+        self.assertTrue(warmup_controller.ready.is_set())
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.client.get('/ready').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
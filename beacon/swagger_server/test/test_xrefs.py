@@ -0,0 +1,194 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from beacon_controller.providers import datasets, xrefs
+from beacon_controller.providers.xrefs import UnionFind, XrefStore, build_cliques
+
+RHEA2XREFS = """RHEA_ID\tDIRECTION\tMASTER_ID\tID\tDB
+10001\tLR\t10000\tR00001\tKEGG_REACTION
+10002\tRL\t10000\tRXN-1\tMetaCyc
+10004\tUN\t10004\t1.1.1.1\tEC
+10005\tLR\t10004\tRXN-2\tMetaCyc
+"""
+
+
+class XrefsTestCase(unittest.TestCase):
+    """Serves the xrefs from a store read from RHEA2XREFS"""
+
+    tsv = RHEA2XREFS
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+        tsv = os.path.join(self.path, 'rhea2xrefs.tsv')
+        with open(tsv, 'w') as f:
+            f.write(self.tsv)
+        self.store = XrefStore.from_tsv(tsv)
+
+        patcher = mock.patch.dict(datasets.registry.values, xrefs=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestUnionFind(unittest.TestCase):
+    """UnionFind unit tests"""
+
+    def test_union(self):
+        uf = UnionFind()
+        nodes = [uf.add() for _ in range(6)]
+        uf.union(nodes[0], nodes[1])
+        uf.union(nodes[2], nodes[1])
+        uf.union(nodes[3], nodes[4])
+        uf.union(nodes[4], nodes[3])
+
+        self.assertEqual(len({uf.find(i) for i in nodes[:3]}), 1)
+        self.assertEqual(uf.find(nodes[3]), uf.find(nodes[4]))
+        self.assertNotEqual(uf.find(nodes[0]), uf.find(nodes[3]))
+        self.assertEqual(uf.find(nodes[5]), nodes[5])
+        self.assertEqual(uf.sizes[uf.find(nodes[0])], 3)
+
+
+class TestBuildCliques(unittest.TestCase):
+    """build_cliques unit tests"""
+
+    reaction_ids = [10000, 10001, 10002, 10004, 10008]
+
+    rows = [
+        (10001, 10000, 'KEGG_REACTION', 'R00001'),
+        (10002, 10000, 'MetaCyc', 'RXN-1'),
+        (10004, 10004, 'MetaCyc', 'RXN-2'),
+        (10008, 10008, 'MetaCyc', 'RXN-2'),
+    ]
+
+    def cliques(self):
+        curies, curie_cliques, clique_ptr, members = build_cliques(self.reaction_ids, self.rows)
+        curies = list(curies)
+        return {
+            curie : {curies[i] for i in members[clique_ptr[clique]:clique_ptr[clique + 1]]}
+            for curie, clique in zip(curies, curie_cliques.tolist())
+        }, curies
+
+    def test_transitive(self):
+        cliques, _ = self.cliques()
+        self.assertEqual(cliques['RHEA:10002'], {
+            'RHEA:10000', 'RHEA:10001', 'RHEA:10002',
+            'KEGG:R00001', 'KEGG.REACTION:R00001', 'MetaCyc:RXN-1',
+        })
+        self.assertEqual(cliques['KEGG:R00001'], cliques['MetaCyc:RXN-1'])
+
+    def test_shared_xref_joins_reactions(self):
+        cliques, _ = self.cliques()
+        self.assertEqual(cliques['RHEA:10004'], {'RHEA:10004', 'RHEA:10008', 'MetaCyc:RXN-2'})
+
+    def test_sorted_curies(self):
+        _, curies = self.cliques()
+        self.assertEqual(curies, sorted(curies))
+        self.assertEqual(len(curies), len(set(curies)))
+
+    def test_members_partition_curies(self):
+        curies, curie_cliques, clique_ptr, members = build_cliques(self.reaction_ids, self.rows)
+        self.assertEqual(sorted(members.tolist()), list(range(len(curies))))
+        self.assertEqual(clique_ptr[-1], len(curies))
+        for clique in range(len(clique_ptr) - 1):
+            group = members[clique_ptr[clique]:clique_ptr[clique + 1]]
+            self.assertEqual(set(curie_cliques[group].tolist()), {clique})
+
+    def test_empty(self):
+        curies, curie_cliques, clique_ptr, members = build_cliques([], [])
+        self.assertEqual(len(curies), 0)
+        self.assertEqual(clique_ptr.tolist(), [0])
+
+
+class TestEquivalenceCliques(XrefsTestCase):
+    """Cliques joined through shared xrefs"""
+
+    tsv = RHEA2XREFS + '10008\tUN\t10008\tRXN-2\tMetaCyc\n10010\tUN\t10010\t2.2.2.2\tEC\n'
+
+    def test_shared_xref(self):
+        self.assertEqual(xrefs.get_xrefs('RHEA:10008'), ['MetaCyc:RXN-2', 'RHEA:10004', 'RHEA:10005', 'RHEA:10008'])
+        self.assertEqual(xrefs.get_xrefs('RHEA:10004'), xrefs.get_xrefs('RHEA:10008'))
+
+    def test_clique_sizes(self):
+        self.assertEqual(sorted(xrefs.clique_sizes()), [1, 4, 6])
+
+    def test_count_xref_reactions(self):
+        # Reactions with an xref other than an EC number, as /namespaces
+        # counted them from the dataframe
+        self.assertEqual(xrefs.count_xref_reactions(), 4)
+
+
+class TestXrefStore(XrefsTestCase):
+    """XrefStore unit tests"""
+
+    def test_saved_store(self):
+        self.store.save(os.path.join(self.path, 'store'))
+        store = XrefStore.load(os.path.join(self.path, 'store'))
+
+        self.assertEqual(len(store), len(self.store))
+        self.assertTrue(store.has_reaction('10004'))
+        self.assertFalse(store.has_reaction('10000'))
+        self.assertFalse(store.has_reaction('010004'))
+        self.assertFalse(store.has_reaction('R00001'))
+
+        clique = store.clique_of('KEGG.REACTION:R00001')
+        self.assertEqual(clique, store.clique_of('RHEA:10002'))
+        self.assertEqual(store.members(clique), [
+            'KEGG.REACTION:R00001', 'KEGG:R00001', 'MetaCyc:RXN-1',
+            'RHEA:10000', 'RHEA:10001', 'RHEA:10002',
+        ])
+        self.assertIsNone(store.clique_of('EC:1.1.1.1'))
+        self.assertEqual(sorted(store.clique_sizes()), sorted(self.store.clique_sizes()))
+        self.assertEqual(store.count_prefix('RHEA'), 5)
+        self.assertEqual(store.count_prefix('KEGG'), 1)
+        self.assertEqual(store.count_xref_reactions(), self.store.count_xref_reactions())
+
+    def test_loaded_from_store_path(self):
+        self.store.save(os.path.join(self.path, 'xrefs'))
+
+        with mock.patch.object(xrefs, 'store_path', lambda: os.path.join(self.path, 'xrefs')), mock.patch.object(xrefs, 'tsv_path', lambda: None):
+            datasets.invalidate('xrefs')
+            self.assertEqual(xrefs.get_xrefs('RHEA:10005'), ['MetaCyc:RXN-2', 'RHEA:10004', 'RHEA:10005'])
+
+
+class TestGetXrefs(XrefsTestCase):
+    """get_xrefs_batch unit tests"""
+
+    def test_batch(self):
+        results = xrefs.get_xrefs_batch(['RHEA:10001', 'kegg:r00001', 'rhea:10005', 'RHEA:10004'])
+
+        self.assertEqual(results['RHEA:10001'], [
+            'KEGG.REACTION:R00001', 'KEGG:R00001', 'MetaCyc:RXN-1',
+            'RHEA:10000', 'RHEA:10001', 'RHEA:10002',
+        ])
+        self.assertEqual(results['kegg:r00001'], results['RHEA:10001'])
+        self.assertEqual(results['rhea:10005'], ['MetaCyc:RXN-2', 'RHEA:10004', 'RHEA:10005'])
+        self.assertEqual(results['RHEA:10004'], results['rhea:10005'])
+
+    def test_unknown(self):
+        self.assertEqual(xrefs.get_xrefs_batch(['RHEA:99999', 'KEGG:R99999', 'RHEA', '']), {
+            'RHEA:99999' : [], 'KEGG:R99999' : [], 'RHEA' : [], '' : [],
+        })
+
+    def test_master_ids_are_not_reactions(self):
+        self.assertEqual(xrefs.get_xrefs('RHEA:10000'), [])
+
+    def test_ec_numbers_are_not_xrefs(self):
+        self.assertEqual(xrefs.get_xrefs('EC:1.1.1.1'), [])
+        self.assertNotIn('EC:1.1.1.1', xrefs.get_xrefs('RHEA:10004'))
+
+    def test_get_xrefs(self):
+        for curie in ['RHEA:10002', 'KEGG.REACTION:R00001', 'RHEA:10005', 'RHEA:99999']:
+            with self.subTest(curie=curie):
+                self.assertEqual(xrefs.get_xrefs(curie), xrefs.get_xrefs_batch([curie])[curie])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,5 +3,6 @@ from config import config
 from . import biolink_model
 from .controllers.concepts_controller import get_concept_details, get_concepts, get_exact_matches_to_concept_list
 from .controllers.statements_controller import get_statement_details, get_statements
+from .controllers.statements_controller import get_statements_page, iter_statements, iter_statement_batches
 from .controllers.metadata_controller import get_concept_categories, get_knowledge_map, get_predicates, get_namespaces
 from .controllers.main_controller import main
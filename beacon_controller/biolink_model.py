@@ -1,19 +1,15 @@
 import bmt
 
-tk = None
-
 from typing import List
 
+from beacon_controller.providers.datasets import dataset
+
 DEFAULT_EDGE_LABEL = 'related_to'
 DEFAULT_CATEGORY = 'named thing'
 
+@dataset('biolink_model')
 def toolkit_instance():
-    global tk
-
-    if tk is None:
-        tk = bmt.Toolkit()
-
-    return tk
+    return bmt.Toolkit()
 
 def slot_uri(s:str) -> str:
     return f'https://biolink.github.io/biolink-model/docs/{s.replace(" ", "_")}.html'
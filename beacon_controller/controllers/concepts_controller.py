@@ -5,7 +5,7 @@ from swagger_server.models.exact_match_response import ExactMatchResponse  # noq
 
 from beacon_controller import biolink_model as blm
 from beacon_controller.providers import rhea
-from beacon_controller.providers.xrefs import get_xrefs
+from beacon_controller.providers.xrefs import get_xrefs_batch
 from beacon_controller.const import Category, Predicate
 
 def get_concept_details(concept_id):  # noqa: E501
@@ -47,66 +47,76 @@ def get_concept_details(concept_id):  # noqa: E501
             details=[]
         )
     elif concept_id.startswith('RHEA:'):
-        records = rhea.get_records(f"""
-        PREFIX rh:<http://rdf.rhea-db.org/>
-        SELECT
-        ?equation
-        ?reaction
-        WHERE {{
-            ?reaction rh:accession "{concept_id}" .
-            ?reaction rh:equation ?equation .
-        }}
-        LIMIT 1
-        """)
-
-        for record in records:
-            return BeaconConceptWithDetails(
-                id=concept_id,
-                uri=record['reaction']['value'],
-                name=record['equation']['value'],
-                symbol=None,
-                categories=[Category.molecular_activity.name],
-                description=None,
-                synonyms=[],
-                exact_matches=[],
-                details=[]
-            )
+        return build_reaction_details(concept_id, rhea.get_records(reaction_details_query(concept_id)))
 
     else:
-        records = rhea.get_records(f"""
-        PREFIX rh:<http://rdf.rhea-db.org/>
-        SELECT ?compoundAc ?chebi
-               (count(distinct ?reaction) as ?reactionCount)
-               ?compoundName
-        WHERE {{
-          ?reaction rdfs:subClassOf rh:Reaction .
-          ?reaction rh:status rh:Approved .
-          ?reaction rh:side ?reactionSide .
-          ?reactionSide rh:contains ?participant .
-          ?participant rh:compound ?compound .
-          OPTIONAL {{ ?compound rh:chebi ?chebi . }}
-          ?compound rh:name ?compoundName .
-          ?compound rh:accession "{concept_id}" .
-        }}
-        LIMIT 1
-        """)
+        return build_compound_details(concept_id, rhea.get_records(compound_details_query(concept_id)))
+
+def reaction_details_query(concept_id):
+    return f"""
+    PREFIX rh:<http://rdf.rhea-db.org/>
+    SELECT
+    ?equation
+    ?reaction
+    WHERE {{
+        ?reaction rh:accession "{concept_id}" .
+        ?reaction rh:equation ?equation .
+    }}
+    LIMIT 1
+    """
+
+def compound_details_query(concept_id):
+    return f"""
+    PREFIX rh:<http://rdf.rhea-db.org/>
+    SELECT ?compoundAc ?chebi
+           (count(distinct ?reaction) as ?reactionCount)
+           ?compoundName
+    WHERE {{
+      ?reaction rdfs:subClassOf rh:Reaction .
+      ?reaction rh:status rh:Approved .
+      ?reaction rh:side ?reactionSide .
+      ?reactionSide rh:contains ?participant .
+      ?participant rh:compound ?compound .
+      OPTIONAL {{ ?compound rh:chebi ?chebi . }}
+      ?compound rh:name ?compoundName .
+      ?compound rh:accession "{concept_id}" .
+    }}
+    GROUP BY ?compoundAc ?chebi ?compoundName
+    LIMIT 1
+    """
+
+def build_reaction_details(concept_id, records):
+    for record in records:
+        return BeaconConceptWithDetails(
+            id=concept_id,
+            uri=record['reaction']['value'],
+            name=record['equation']['value'],
+            symbol=None,
+            categories=[Category.molecular_activity.name],
+            description=None,
+            synonyms=[],
+            exact_matches=[],
+            details=[]
+        )
+
+def build_compound_details(concept_id, records):
+    for record in records:
         try:
             uri = record['chebi']['value']
         except:
             uri = None
 
-        for record in records:
-            return BeaconConceptWithDetails(
-                id=concept_id,
-                uri=uri,
-                name=record['compoundName']['value'],
-                symbol=None,
-                categories=[Category.chemical_substance.name],
-                description=None,
-                synonyms=[],
-                exact_matches=[],
-                details=[BeaconConceptDetail(tag='reactionCount', value=record['reactionCount']['value'])]
-            )
+        return BeaconConceptWithDetails(
+            id=concept_id,
+            uri=uri,
+            name=record['compoundName']['value'],
+            symbol=None,
+            categories=[Category.chemical_substance.name],
+            description=None,
+            synonyms=[],
+            exact_matches=[],
+            details=[BeaconConceptDetail(tag='reactionCount', value=record['reactionCount']['value'])]
+        )
 
 def get_concepts(keywords=None, categories=None, offset=None, size=None):  # noqa: E501
     """get_concepts
@@ -168,12 +178,14 @@ def get_exact_matches_to_concept_list(c):  # noqa: E501
     :rtype: List[ExactMatchResponse]
     """
 
+    matches = get_xrefs_batch(c)
+
     results = []
     for conceptId in c:
         if ':' not in conceptId:
             continue
 
-        xrefs = get_xrefs(conceptId)
+        xrefs = matches[conceptId]
 
         if xrefs != []:
             results.append(ExactMatchResponse(
@@ -0,0 +1,115 @@
+"""
+Bulk export of statements as newline delimited JSON (one statement per line,
+serialized as in /statements), served at `{basepath}statements/stream`.
+
+/statements builds its whole response before sending any of it, so memory
+grows with `size` and nothing arrives until the end. The stream instead
+writes each batch of statements (see `stream_batch_size` in config.yaml) as
+soon as it has been fetched, so exporting the whole graph takes no more memory
+than a single batch. It takes the same query parameters as /statements, except
+for offset; arrays may be repeated or comma separated.
+
+Tornado's WSGIContainer buffers whole response bodies, so with the tornado
+server the stream is served by StatementsStreamHandler, a native Tornado
+handler that flushes every batch (see main_controller.run_tornado). The Flask
+view, get_statements_stream, is for WSGI servers that stream (e.g. the flask
+development server).
+"""
+
+import json
+import logging
+
+import tornado.web
+
+from flask import Response, request, stream_with_context
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+
+from swagger_server import encoder
+from beacon_controller.controllers import statements_controller
+
+MIMETYPE = 'application/x-ndjson'
+
+ARRAY_PARAMETERS = ['s', 's_keywords', 's_categories', 't', 't_keywords', 't_categories']
+STRING_PARAMETERS = ['edge_label', 'relation']
+
+def parse_arguments(getlist) -> dict:
+    """
+    Returns the keyword arguments of iter_statement_batches, given a function
+    returning the list of values of a query parameter. Raises ValueError for
+    an invalid size.
+    """
+    kwargs = {}
+
+    for name in ARRAY_PARAMETERS:
+        values = [v.strip() for value in getlist(name) for v in value.split(',')]
+        values = [v for v in values if v != '']
+        kwargs[name] = values if values != [] else None
+
+    for name in STRING_PARAMETERS:
+        values = getlist(name)
+        kwargs[name] = values[0] if values != [] else None
+
+    size = getlist('size')
+    if size != []:
+        try:
+            kwargs['size'] = int(size[0])
+        except ValueError:
+            raise ValueError(f'Invalid size: {size[0]}')
+
+    return kwargs
+
+def serialize(statements) -> str:
+    return ''.join(json.dumps(statement, cls=encoder.JSONEncoder, separators=(',', ':')) + '\n' for statement in statements)
+
+def generate(batches):
+    try:
+        for batch in batches:
+            yield serialize(batch)
+    except Exception:
+        # The status has been sent already, so all that can be done is to end
+        # the stream early
+        logging.exception('Statement export failed')
+
+def get_statements_stream():
+    try:
+        kwargs = parse_arguments(request.args.getlist)
+    except ValueError as e:
+        return str(e), 400
+
+    batches = statements_controller.iter_statement_batches(**kwargs)
+
+    return Response(stream_with_context(generate(batches)), mimetype=MIMETYPE)
+
+class StatementsStreamHandler(tornado.web.RequestHandler):
+    async def get(self):
+        try:
+            kwargs = parse_arguments(self.get_arguments)
+        except ValueError as e:
+            self.set_status(400)
+            self.finish(str(e))
+            return
+
+        self.set_header('Content-Type', MIMETYPE)
+
+        batches = statements_controller.iter_statement_batches(**kwargs)
+
+        loop = IOLoop.current()
+
+        try:
+            while True:
+                # Batches are fetched on the default executor so that the
+                # server keeps answering other requests meanwhile
+                batch = await loop.run_in_executor(None, next, batches, None)
+                if batch is None:
+                    break
+                self.write(serialize(batch))
+                await self.flush()
+        except StreamClosedError:
+            logging.info('Statement export client disconnected')
+        except Exception:
+            logging.exception('Statement export failed')
+        finally:
+            batches.close()
+
+        self.finish()
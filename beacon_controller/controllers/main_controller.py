@@ -1,12 +1,47 @@
 import connexion
+import logging
 
+import tornado.web
+
+from concurrent.futures import ThreadPoolExecutor
 from swagger_server import encoder
 from flask import redirect
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.wsgi import WSGIContainer
+
 from beacon_controller import config
+from beacon_controller.controllers import export_controller, metadata_controller, warmup_controller
 
 def handle_error(e):
     return redirect(config['basepath'])
 
+def stream_path() -> str:
+    return f'{config["basepath"].rstrip("/")}/statements/stream'
+
+def run_tornado(app):
+    """
+    Serves the app with Tornado the way connexion does, except that:
+
+    - the statement export is answered by a native handler, as Tornado's
+      WSGIContainer holds back a WSGI response until all of its body has been
+      produced
+    - the WSGI app runs on a pool of `server_threads` threads rather than on
+      the event loop's, where every request would wait for the one before it
+    """
+    executor = ThreadPoolExecutor(max_workers=config['server_threads'])
+
+    application = tornado.web.Application([
+        (stream_path(), export_controller.StatementsStreamHandler),
+        (r'.*', tornado.web.FallbackHandler, dict(fallback=WSGIContainer(app.app, executor=executor))),
+    ])
+
+    HTTPServer(application).listen(config['port'])
+
+    logging.info(f'Listening on port {config["port"]}')
+
+    IOLoop.current().start()
+
 def main(name:str):
     """
     Usage in swagger_server/main.py:
@@ -30,4 +65,13 @@ def main(name:str):
     if config['redirect_404'] and isinstance(config['basepath'], str):
         app.add_error_handler(404, lambda e: redirect(config['basepath']))
 
-    app.run(port=config['port'])
+    app.app.add_url_rule(f'{config["basepath"].rstrip("/")}/ready', 'ready', warmup_controller.get_readiness)
+    app.app.add_url_rule(stream_path(), 'statements_stream', export_controller.get_statements_stream)
+
+    warmup_controller.start()
+    metadata_controller.predicate_counts.start_schedule()
+
+    if config['server'] == 'tornado':
+        run_tornado(app)
+    else:
+        app.run(port=config['port'])
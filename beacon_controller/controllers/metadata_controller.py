@@ -8,13 +8,22 @@ from swagger_server.models.namespace import Namespace
 from swagger_server.models.local_namespace import LocalNamespace
 
 from beacon_controller.const import Category, Predicate
-from beacon_controller.providers import rhea
-from beacon_controller.providers.xrefs import load_df
+from beacon_controller.providers import rhea, xrefs
+from beacon_controller.providers.snapshot import Snapshot
 
 import beacon_controller.biolink_model as blm
-from beacon_controller.providers.xrefs import load_df
 
 import functools
+import logging
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import config
+
+# The frequency the beacon API uses for a count that isn't known
+UNKNOWN_FREQUENCY = -1
+
+executor = ThreadPoolExecutor(max_workers=config['metadata']['max_workers'])
 
 @functools.lru_cache()
 def get_namespaces():
@@ -22,7 +31,7 @@ def get_namespaces():
     Get a list of namespace (curie prefixes) mappings that this beacon can perform with its /exactmatches endpoint  # noqa: E501
     :rtype: List[LocalNamespace]
     """
-    frequency = load_df().RHEA_ID.nunique()
+    frequency = xrefs.count_xref_reactions()
 
     namespaces = [
         Namespace("KEGG.REACTION", uri='http://identifiers.org/kegg/'),
@@ -92,7 +101,6 @@ def get_concept_categories():  # noqa: E501
 
     return categories
 
-@functools.lru_cache()
 def get_knowledge_map():  # noqa: E501
     """get_knowledge_map
 
@@ -101,6 +109,71 @@ def get_knowledge_map():  # noqa: E501
 
     :rtype: List[BeaconKnowledgeMapStatement]
     """
+    return build_knowledge_map(get_predicate_counts())
+
+def get_predicates():  # noqa: E501
+    """get_predicates
+
+    Get a list of predicates used in statements issued by the knowledge source  # noqa: E501
+
+
+    :rtype: List[BeaconPredicate]
+    """
+    return build_predicates(get_predicate_counts())
+
+def compute_predicate_counts() -> dict:
+    """
+    Counts the statements of every predicate concurrently, on up to
+    metadata.max_workers threads. A count that isn't known within
+    metadata.count_timeout seconds, or whose query fails, is -1 (unknown).
+    """
+    futures = {predicate : executor.submit(get_predicate_count, predicate) for predicate in Predicate}
+
+    wait(futures.values(), timeout=config['metadata']['count_timeout'])
+
+    counts = {}
+    for predicate, future in futures.items():
+        if not future.done():
+            logging.warning(f'Timed out counting {predicate.name} statements')
+            counts[predicate.name] = UNKNOWN_FREQUENCY
+        elif future.exception() is not None:
+            logging.warning(f'Failed to count {predicate.name} statements: {future.exception()}')
+            counts[predicate.name] = UNKNOWN_FREQUENCY
+        else:
+            counts[predicate.name] = future.result()
+
+    return counts
+
+def is_complete(counts:dict) -> bool:
+    return all(count != UNKNOWN_FREQUENCY for count in counts.values())
+
+# The predicate counts, persisted per Rhea release (see providers/snapshot.py).
+# Snapshots with unknown counts are served but recomputed.
+predicate_counts = Snapshot('predicate_counts', compute_predicate_counts, complete=is_complete)
+
+def get_predicate_counts() -> dict:
+    """
+    Returns the statement count of each Predicate, from the snapshot.
+    """
+    counts = predicate_counts.get()
+    return {predicate : counts.get(predicate.name) for predicate in Predicate}
+
+def get_predicate_count(predicate:Predicate):
+        results = rhea.get_records(predicate_count_query(predicate))
+        for result in results:
+            return int(result['statementCount']['value'])
+
+def predicate_count_query(predicate:Predicate):
+    return f"""
+    PREFIX rh:<http://rdf.rhea-db.org/>
+    SELECT
+    (count(distinct ?subjectId) as ?statementCount)
+    WHERE {{
+        {predicate.sparql}
+    }}
+    """
+
+def build_knowledge_map(counts:dict):
     kmaps = []
     for predicate in Predicate:
         kmaps.append(BeaconKnowledgeMapStatement(
@@ -118,41 +191,20 @@ def get_knowledge_map():  # noqa: E501
                 category=predicate.codomain.name,
                 prefixes=predicate.codomain.prefixes
             ),
-            frequency=get_predicate_count(predicate)
+            frequency=counts[predicate]
         ))
 
     return kmaps
 
-@functools.lru_cache()
-def get_predicates():  # noqa: E501
-    """get_predicates
-
-    Get a list of predicates used in statements issued by the knowledge source  # noqa: E501
-
-
-    :rtype: List[BeaconPredicate]
-    """
+def build_predicates(counts:dict):
     predicates = []
     for predicate in Predicate:
         description = blm.get_slot(predicate.edge_label).description
         predicates.append(BeaconPredicate(
             edge_label=predicate.edge_label,
             relation=predicate.relation,
-            frequency=get_predicate_count(predicate),
+            frequency=counts[predicate],
             description=description
         ))
     return predicates
 
-@functools.lru_cache()
-def get_predicate_count(predicate:Predicate):
-        q=f"""
-        PREFIX rh:<http://rdf.rhea-db.org/>
-        SELECT
-        (count(distinct ?subjectId) as ?statementCount)
-        WHERE {{
-            {predicate.sparql}
-        }}
-        """
-        results = rhea.get_records(q)
-        for result in results:
-            return int(result['statementCount']['value'])
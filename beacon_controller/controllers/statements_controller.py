@@ -6,12 +6,31 @@ from swagger_server.models.beacon_statement_object import BeaconStatementObject
 from swagger_server.models.beacon_statement_predicate import BeaconStatementPredicate
 from swagger_server.models.beacon_statement_subject import BeaconStatementSubject
 
-from beacon_controller.providers import rhea, pubmed
+from beacon_controller.providers import rhea, pubmed, edges
 from beacon_controller.const import Predicate, Category
 import beacon_controller.biolink_model as blm
 
+import base64
+import json
+import logging
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import time
+
+from config import config
+
 pubmed_client = pubmed.PubMedRetreiver(email='lance@starinformatics.com')
 
+executor = ThreadPoolExecutor(max_workers=config['statements']['max_workers'])
+
+# The cursor that requests the first page of cursor paginated statements
+START_CURSOR = '*'
+
+# The order that offset pages are cut from, whether they are fetched with a
+# single UNION query or with one query per predicate (see page_key). Every
+# predicate has its own edge label and relation.
+PAGE_ORDER = 'ORDER BY ?edge_label ?relation str(?subjectId) str(?objectId) ?subjectName ?objectName'
+
 def get_category(curie):
     prefix, _ = curie.upper().split(':', 1)
     for category in Category:
@@ -48,6 +67,9 @@ def get_statement_details(statement_id, keywords=None, offset=None, size=None):
         get_citations=True
     )
 
+    return build_statement_details(statement_id, records, offset, size)
+
+def build_statement_details(statement_id, records, offset=None, size=None):
     for d in records:
         citations = get(d, 'citations', 'value').split('|')
 
@@ -62,8 +84,9 @@ def get_statement_details(statement_id, keywords=None, offset=None, size=None):
         evidence = []
         for citation in citations:
             k = citation.replace('http://rdf.ncbi.nlm.nih.gov/pubmed/', '')
-            date = result[k]['pubdate']
-            name = result[k]['title']
+            summary = result.get(k, {})
+            date = summary.get('pubdate')
+            name = summary.get('title')
             evidence.append(BeaconStatementCitation(
                 id=citation.replace('http://rdf.ncbi.nlm.nih.gov/pubmed/', 'PUBMED:'),
                 uri=citation,
@@ -96,24 +119,70 @@ def get(d:dict, *keys):
     return d
 
 def get_records(edge_label=None, relation=None, s=None, t=None, s_keywords=None, t_keywords=None, s_categories=None, t_categories=None, size=None, offset=None, get_citations=False):
-    unions = []
-    for edge in Predicate:
-        if edge.matches(edge_label, relation, s_categories, t_categories):
-            if get_citations:
-                unions.append(edge.sparql_with_citations)
-            else:
-                unions.append(edge.sparql)
-
-    if len(unions) == 0:
+    predicates = [p for p in Predicate if p.matches(edge_label, relation, s_categories, t_categories)]
+
+    tables = edges.load_tables()
+
+    if tables is not None:
+        return edges.get_records(
+            tables,
+            predicates,
+            s=s,
+            t=t,
+            s_keywords=s_keywords,
+            t_keywords=t_keywords,
+            size=size,
+            offset=offset,
+            get_citations=get_citations
+        )
+
+    if len(predicates) == 0:
         # In this case nothing can match the given filters
         return []
-    else:
-        where_block = ' UNION '.join(f'{s}' for s in unions)
 
-    q=f"""
+    paged = isinstance(offset, int) and offset >= 0
+
+    if not isinstance(size, int) or size < 0:
+        # Without a size the results may be the whole graph, so they are
+        # parsed and turned into statements as they stream in
+        q = build_query(predicates, s, t, s_keywords, t_keywords, None, offset, get_citations, paged=paged)
+        return rhea.iter_records(q)
+
+    if use_fanout(predicates, size, offset):
+        return get_records_fanout(predicates, s, t, s_keywords, t_keywords, size, offset, get_citations)
+
+    q = build_query(predicates, s, t, s_keywords, t_keywords, size, offset, get_citations, paged=True)
+
+    print(q)
+
+    return rhea.get_records(q)
+
+def page_key(record) -> tuple:
+    """
+    The sort key of a record in the order of PAGE_ORDER.
+    """
+    return tuple(get(record, name, 'value') or '' for name in ['edge_label', 'relation', 'subjectId', 'objectId', 'subjectName', 'objectName'])
+
+def build_query(predicates, s=None, t=None, s_keywords=None, t_keywords=None, size=None, offset=None, get_citations=False, ordered=False, after=None, paged=False):
+    """
+    When ordered is set the rows are distinct and sorted by subject and then
+    object id, and after may be a (subject id, object id) pair to resume from.
+    When paged is set the rows are sorted in PAGE_ORDER, so that offset pages
+    neither skip nor repeat statements.
+    """
+    unions = []
+    for edge in predicates:
+        if get_citations:
+            unions.append(edge.sparql_with_citations)
+        else:
+            unions.append(edge.sparql)
+
+    where_block = ' UNION '.join(f'{s}' for s in unions)
+
+    return f"""
     PREFIX rh:<http://rdf.rhea-db.org/>
     PREFIX EC:<http://purl.uniprot.org/enzyme/>
-    SELECT
+    SELECT {'DISTINCT' if ordered else ''}
       ?subjectId
       ?subjectName
       ?objectId
@@ -127,14 +196,157 @@ def get_records(edge_label=None, relation=None, s=None, t=None, s_keywords=None,
         {rhea.build_id_filter('objectId', t)}
         {rhea.build_substring_filter('subjectName', s_keywords)}
         {rhea.build_substring_filter('objectName', t_keywords)}
+        {rhea.build_keyset_filter(['subjectId', 'objectId'], after)}
     }}
+    {'GROUP BY ?subjectId ?subjectName ?objectId ?objectName ?edge_label ?relation' if get_citations else ''}
+    {'ORDER BY str(?subjectId) str(?objectId)' if ordered else PAGE_ORDER if paged else ''}
     {build_offset(offset)}
     {build_size(size)}
     """
 
-    print(q)
+def encode_cursor(predicate:Predicate, subject_id:str, object_id:str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([predicate.name, subject_id, object_id]).encode('utf-8')).decode('ascii')
 
-    return rhea.get_records(q)
+def decode_cursor(cursor:str):
+    """
+    Returns the (predicate, subject id, object id) of the last statement of
+    the previous page, or None for START_CURSOR. Raises ValueError if the
+    cursor is not one we issued.
+    """
+    if cursor == START_CURSOR:
+        return None
+    try:
+        name, subject_id, object_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return Predicate[name], subject_id, object_id
+    except Exception:
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+def get_records_page(edge_label=None, relation=None, s=None, t=None, s_keywords=None, t_keywords=None, s_categories=None, t_categories=None, size=None, cursor=START_CURSOR, get_citations=False):
+    """
+    Keyset pagination: statements are ordered by predicate (in Predicate
+    order), subject id and object id, and each page resumes after the last
+    statement of the previous one, which the cursor encodes. Returns the
+    page's records and the cursor of the next page, or None if this is the
+    last page.
+
+    The predicates are queried one after another, each for just the rows still
+    needed to fill the page. With the edge tables a page is a seek into the
+    sorted tables, so it costs the same however deep it is. With SPARQL the
+    endpoint still sorts all of a predicate's matching statements for every
+    page (ORDER BY with the keyset FILTER), and only the rows before the page
+    are no longer sent and skipped.
+    """
+    after = decode_cursor(cursor)
+
+    order = list(Predicate)
+    predicates = [p for p in Predicate if p.matches(edge_label, relation, s_categories, t_categories)]
+
+    if after is not None:
+        predicates = [p for p in predicates if order.index(p) >= order.index(after[0])]
+
+    size = size if isinstance(size, int) and size >= 0 else None
+
+    tables = edges.load_tables()
+
+    records = []
+    last = None
+
+    for predicate in predicates:
+        remaining = size - len(records) if size is not None else None
+
+        if remaining == 0:
+            break
+
+        key = after[1:] if after is not None and after[0] is predicate else None
+
+        if tables is not None:
+            try:
+                page = edges.get_records(tables, [predicate], s, t, s_keywords, t_keywords, size=remaining, get_citations=get_citations, after=key)
+            except ValueError:
+                raise ValueError(f'Invalid cursor: {cursor}')
+        else:
+            q = build_query([predicate], s, t, s_keywords, t_keywords, remaining, None, get_citations, ordered=True, after=key)
+            page = rhea.get_records(q)
+
+        if len(page) > 0:
+            records.extend(page)
+            last = (predicate, page[-1])
+
+    next_cursor = None
+
+    if size is not None and len(records) == size and last is not None:
+        predicate, record = last
+        next_cursor = encode_cursor(predicate, get(record, 'subjectId', 'value'), get(record, 'objectId', 'value'))
+
+    return records, next_cursor
+
+def use_fanout(predicates, size=None, offset=None) -> bool:
+    """
+    Fanning out only pays for shallow pages: every branch has to be asked for
+    its first offset + size rows, so deeper pages (beyond
+    statements.fanout_max_rows) are left to a single UNION query with an
+    OFFSET.
+    """
+    if not config['statements']['fanout'] or len(predicates) <= 1:
+        return False
+
+    offset = offset if isinstance(offset, int) and offset >= 0 else 0
+
+    return offset + size <= config['statements']['fanout_max_rows']
+
+def get_records_fanout(predicates, s=None, t=None, s_keywords=None, t_keywords=None, size=None, offset=None, get_citations=False):
+    """
+    Issues one query per predicate concurrently instead of a single UNION,
+    so that one expensive edge type doesn't hold up the others.
+
+    Each branch is asked for its first offset + size rows in PAGE_ORDER, and
+    the merged rows are sorted the same way before offset and size are
+    applied, so that the page is the one the UNION query would return. A
+    branch is given statements.branch_timeout seconds from when it starts
+    running (not from when it was queued on the shared pool). The statements
+    of a branch that times out or fails are left out of the page, which is
+    logged.
+    """
+    offset = offset if isinstance(offset, int) and offset >= 0 else 0
+    limit = offset + size if isinstance(size, int) and size >= 0 else None
+
+    timeout = config['statements']['branch_timeout']
+
+    started = {}
+
+    def branch(predicate):
+        started[predicate] = time()
+        return rhea.get_records(build_query([predicate], s, t, s_keywords, t_keywords, limit, None, get_citations, paged=True))
+
+    futures = {executor.submit(branch, p) : p for p in predicates}
+
+    pending = set(futures)
+
+    while pending:
+        now = time()
+        deadlines = [started[futures[f]] + timeout for f in pending if futures[f] in started]
+
+        if any(deadline <= now for deadline in deadlines):
+            break
+
+        # Until a branch starts, wait for one of the running ones to finish
+        # and free its worker
+        _, pending = wait(pending, timeout=min(deadlines) - now if deadlines else timeout, return_when=FIRST_COMPLETED)
+
+    records = []
+
+    for future, predicate in futures.items():
+        if future in pending:
+            future.cancel()
+            logging.warning(f'Timed out waiting for {predicate.name} statements, leaving them out of the page')
+        elif future.exception() is not None:
+            logging.warning(f'Failed to get {predicate.name} statements, leaving them out of the page: {future.exception()}')
+        else:
+            records.extend(future.result())
+
+    records.sort(key=page_key)
+
+    return records[offset:limit]
 
 def get_statements(s=None, s_keywords=None, s_categories=None, edge_label=None, relation=None, t=None, t_keywords=None, t_categories=None, offset=None, size=None):  # noqa: E501
     """get_statements
@@ -178,10 +390,87 @@ def get_statements(s=None, s_keywords=None, s_categories=None, edge_label=None,
         offset=offset
     )
 
+    return build_statements(records)
+
+def get_statements_page(s=None, s_keywords=None, s_categories=None, edge_label=None, relation=None, t=None, t_keywords=None, t_categories=None, size=None, cursor=START_CURSOR):
+    """
+    Like get_statements, but paginated with a cursor rather than an offset
+    (see get_records_page). Returns the statements and the cursor of the next
+    page, or None if there are no more. Raises ValueError for an invalid
+    cursor.
+    """
+    records, next_cursor = get_records_page(
+        s=s,
+        t=t,
+        edge_label=edge_label,
+        relation=relation,
+        s_keywords=s_keywords,
+        t_keywords=t_keywords,
+        s_categories=s_categories,
+        t_categories=t_categories,
+        size=size,
+        cursor=cursor
+    )
+
+    return build_statements(records), next_cursor
+
+def iter_statement_batches(s=None, s_keywords=None, s_categories=None, edge_label=None, relation=None, t=None, t_keywords=None, t_categories=None, size=None):
+    """
+    Generates the statements matching the query, in the order of cursor
+    pagination, as lists of up to statements.stream_batch_size statements so
+    that only one batch is ever held in memory. Stops after size statements if
+    one is given.
+    """
+    batch_size = config['statements']['stream_batch_size']
+    size = size if isinstance(size, int) and size >= 0 else None
+
+    cursor = START_CURSOR
+    count = 0
+
+    while cursor is not None:
+        n = batch_size if size is None else min(batch_size, size - count)
+
+        if n <= 0:
+            break
+
+        statements, cursor = get_statements_page(
+            s=s,
+            t=t,
+            edge_label=edge_label,
+            relation=relation,
+            s_keywords=s_keywords,
+            t_keywords=t_keywords,
+            s_categories=s_categories,
+            t_categories=t_categories,
+            size=n,
+            cursor=cursor
+        )
+
+        count += len(statements)
+
+        if len(statements) > 0:
+            yield statements
+
+def iter_statements(s=None, s_keywords=None, s_categories=None, edge_label=None, relation=None, t=None, t_keywords=None, t_categories=None, size=None):
+    """
+    Generates the statements of iter_statement_batches one at a time.
+    """
+    for batch in iter_statement_batches(s, s_keywords, s_categories, edge_label, relation, t, t_keywords, t_categories, size):
+        yield from batch
+
+def build_statements(records):
+    """
+    Builds the statements of the records, which may be an iterator (e.g. one
+    parsing the records as they arrive): they are only gone through once.
+    """
     ec_uri = 'http://purl.uniprot.org/enzyme/'
 
     statements = []
 
+    # Enzyme concepts are named at the end, looking up all of their names at
+    # once
+    ec_concepts = []
+
     for d in records:
         subject_id = get(d, 'subjectId', 'value')
         subject_name = get(d, 'subjectName', 'value')
@@ -190,13 +479,14 @@ def get_statements(s=None, s_keywords=None, s_categories=None, edge_label=None,
         edge_label = get(d, 'edge_label', 'value')
         realtion = get(d, 'relation', 'value')
 
-        if subject_id.startswith(ec_uri):
+        subject_is_ec = subject_id.startswith(ec_uri)
+        object_is_ec = object_id.startswith(ec_uri)
+
+        if subject_is_ec:
             subject_id = subject_id.replace(ec_uri, 'EC:')
-            subject_name = rhea.get_enzyme_name(subject_id)
 
-        if object_id.startswith(ec_uri):
+        if object_is_ec:
             object_id = object_id.replace(ec_uri, 'EC:')
-            object_name = rhea.get_enzyme_name(object_id)
 
         subject_category = get_category(subject_id)
         object_category = get_category(object_id)
@@ -219,6 +509,11 @@ def get_statements(s=None, s_keywords=None, s_categories=None, edge_label=None,
             categories=[object_category]
         )
 
+        if subject_is_ec:
+            ec_concepts.append(s)
+        if object_is_ec:
+            ec_concepts.append(o)
+
         statements.append(BeaconStatement(
             id=f'{s.id}|{p.edge_label}|{p.relation}|{o.id}',
             subject=s,
@@ -226,6 +521,12 @@ def get_statements(s=None, s_keywords=None, s_categories=None, edge_label=None,
             object=o
         ))
 
+    ec_ids = list({concept.id for concept in ec_concepts})
+    ec_names = dict(zip(ec_ids, rhea.get_enzyme_names(ec_ids)))
+
+    for concept in ec_concepts:
+        concept.name = ec_names[concept.id]
+
     return statements
 
 def build_offset(offset):
@@ -0,0 +1,93 @@
+"""
+Startup warm-up: looks up the Rhea release, loads the shared datasets
+(including the Biolink Model toolkit), builds the keyword search indexes and
+computes the metadata endpoints' responses, so that the first requests a new
+server receives don't pay for any of it.
+
+The readiness endpoint (`{basepath}ready`) answers 503 until warm-up has
+finished and 200 after, so a load balancer can hold traffic back until then.
+Steps that fail are logged and reported but don't keep the server from
+becoming ready; what they would have loaded is loaded on first use instead.
+"""
+
+import logging
+import threading
+
+from time import time
+
+from flask import jsonify
+
+from config import config
+from beacon_controller.controllers import metadata_controller
+from beacon_controller.providers import datasets, release, rhea
+
+ready = threading.Event()
+
+status = {
+    'started_at' : None,
+    'finished_at' : None,
+    'steps' : {},
+}
+
+def look_up_release():
+    release.get_release(wait=True)
+
+def load_datasets():
+    datasets.registry.preload()
+
+def build_search_indexes():
+    rhea.find_enzymes([], size=0)
+    if rhea.load_compound_df() is not None:
+        rhea.find_compounds([], limit=0)
+
+# (config.yaml setting, step name, function)
+STEPS = [
+    ('release', 'release', look_up_release),
+    ('datasets', 'datasets', load_datasets),
+    ('search_indexes', 'search_indexes', build_search_indexes),
+    ('metadata', 'namespaces', metadata_controller.get_namespaces),
+    ('metadata', 'concept_categories', metadata_controller.get_concept_categories),
+    ('metadata', 'knowledge_map', metadata_controller.get_knowledge_map),
+    ('metadata', 'predicates', metadata_controller.get_predicates),
+]
+
+def warm_up():
+    """
+    Runs every warm-up step enabled in config.yaml, then marks the server as
+    ready.
+    """
+    settings = config['warmup']
+
+    status['started_at'] = time()
+
+    for setting, name, step in STEPS:
+        if not settings[setting]:
+            continue
+
+        start = time()
+        try:
+            step()
+            status['steps'][name] = {'seconds' : round(time() - start, 3)}
+        except Exception as e:
+            logging.exception(f'Warm-up step {name} failed')
+            status['steps'][name] = {'seconds' : round(time() - start, 3), 'error' : str(e)}
+
+    status['finished_at'] = time()
+    ready.set()
+
+    logging.info(f'Warmed up in {status["finished_at"] - status["started_at"]:.1f}s')
+
+def start():
+    """
+    Starts warming up in a background thread, or marks the server as ready
+    straight away if warm-up is disabled.
+    """
+    if not config['warmup']['enabled']:
+        ready.set()
+        return
+
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
+def get_readiness():
+    body = dict(status, ready=ready.is_set(), datasets=datasets.stats())
+    return jsonify(body), 200 if ready.is_set() else 503
@@ -0,0 +1,345 @@
+"""
+Caches SPARQL results in process. Entries are keyed on a hash of the
+normalized query text, expire after a configured time to live, and
+are evicted least recently used first once either the entry count or the
+approximate memory bound is exceeded. Settings live in the `cache` section of
+config/config.yaml.
+
+Optionally the in process cache is backed by a SQLite file shared by every
+worker on the host, which also survives restarts.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+import data
+
+from collections import OrderedDict
+from time import time
+
+from config import config
+from beacon_controller.providers.release import get_release, UNKNOWN
+
+# String literals and IRIs, kept verbatim, or runs of whitespace and comments
+TOKENS = re.compile(r"""
+    \"\"\"(?:[^"\\]|\\.|"(?!""))*\"\"\"
+  | '''(?:[^'\\]|\\.|'(?!''))*'''
+  | "(?:[^"\\\n\r]|\\.)*"
+  | '(?:[^'\\\n\r]|\\.)*'
+  | <[^<>"{}|^`\\\x00-\x20]*>
+  | (?P<space>(?:[ \t\r\n]|\#[^\n\r]*)+)
+""", re.VERBOSE)
+
+def normalize(sparql_query:str) -> str:
+    """
+    Replaces each run of whitespace and comments outside string literals and
+    IRIs by a single space, so that queries differing only in indentation or
+    line breaks share a cache entry while literals are compared verbatim.
+    """
+    return TOKENS.sub(lambda m: ' ' if m.group('space') else m.group(0), sparql_query).strip()
+
+def make_key(sparql_query:str) -> str:
+    return hashlib.sha1(normalize(sparql_query).encode('utf-8')).hexdigest()
+
+class QueryCache(object):
+    """
+    A thread safe LRU cache with a time to live. The size of each entry is
+    given by the caller (the length of the raw response body), and is used to
+    keep the total below `max_bytes`.
+
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, max_bytes=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires = entry
+
+            if expires is not None and expires < time():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size=0):
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expires = time() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, expires)
+            self.total_bytes += size
+
+            while self._over_capacity():
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits' : self.hits,
+                'misses' : self.misses,
+                'evictions' : self.evictions,
+                'entries' : len(self._entries),
+                'bytes' : self.total_bytes,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def _over_capacity(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            return True
+        return False
+
+class SqliteCache(object):
+    """
+    A persistent cache stored in a SQLite database. The database is opened in
+    WAL mode so that any number of processes can read while one writes, and
+    each thread (and forked process) gets its own connection. Entries are
+    tagged with the Rhea release they were fetched from, and entries belonging
+    to any other release are ignored and purged. Values whose serialized size
+    exceeds `compress_threshold` bytes are stored zlib compressed, and expired
+    entries are deleted at most every `purge_interval` seconds when writing.
+    """
+
+    def __init__(self, path, release, ttl=None, compress_threshold=4096, purge_interval=3600):
+        self.path = path
+        self.release = release
+        self.ttl = ttl
+        self.compress_threshold = compress_threshold
+        self.purge_interval = purge_interval
+        self.purged_at = time()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._local = threading.local()
+
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    release TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    compressed INTEGER NOT NULL,
+                    value BLOB NOT NULL
+                )
+            """)
+            conn.execute('DELETE FROM responses WHERE release != ?', (self.release,))
+        self.purge_expired()
+
+    def _connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+
+        if getattr(self._local, 'pid', None) != pid:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = pid
+
+        return self._local.conn
+
+    def lookup(self, key):
+        """
+        Returns a tuple of the cached value and its size, or None.
+        """
+        row = self._connection().execute(
+            'SELECT created, size, compressed, value FROM responses WHERE key = ? AND release = ?',
+            (key, self.release)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        created, size, compressed, value = row
+
+        if self.ttl is not None and created + self.ttl < time():
+            self.misses += 1
+            return None
+
+        if compressed:
+            value = zlib.decompress(value)
+
+        self.hits += 1
+        return json.loads(value.decode('utf-8')), size
+
+    def get(self, key):
+        entry = self.lookup(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key, value, size=0):
+        blob = json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+        compressed = len(blob) > self.compress_threshold
+        if compressed:
+            blob = zlib.compress(blob)
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                (key, self.release, time(), size, int(compressed), sqlite3.Binary(blob))
+            )
+
+        if time() - self.purged_at > self.purge_interval:
+            self.purge_expired()
+
+    def purge_expired(self):
+        self.purged_at = time()
+
+        if self.ttl is None:
+            return
+
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM responses WHERE created < ?', (self.purged_at - self.ttl,))
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM responses')
+
+    def stats(self) -> dict:
+        entries, = self._connection().execute('SELECT count(*) FROM responses').fetchone()
+        return {
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'entries' : entries,
+        }
+
+class TieredCache(object):
+    """
+    Looks values up in the in process cache first and then in the shared
+    persistent cache, promoting persistent hits into memory.
+    """
+
+    def __init__(self, memory:QueryCache, disk:SqliteCache):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+
+        if value is None:
+            entry = self.disk.lookup(key)
+            if entry is not None:
+                value, size = entry
+                self.memory.put(key, value, size)
+
+        return value
+
+    def put(self, key, value, size=0):
+        self.memory.put(key, value, size)
+        self.disk.put(key, value, size)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+    def stats(self) -> dict:
+        return {
+            'memory' : self.memory.stats(),
+            'disk' : self.disk.stats(),
+        }
+
+query_cache = None
+cache_release = None
+lock = threading.Lock()
+
+def get_cache():
+    """
+    Returns the process wide query cache, or None if caching is disabled. The
+    cache is replaced whenever the Rhea release changes.
+    """
+    global query_cache, cache_release
+
+    settings = config['cache']
+
+    if not settings['enabled']:
+        return None
+
+    release = get_release()
+
+    if query_cache is None or release != cache_release:
+        with lock:
+            if query_cache is None or release != cache_release:
+                query_cache = make_cache(settings, release)
+                cache_release = release
+
+    return query_cache
+
+def make_cache(settings:dict, release:str):
+    memory = QueryCache(
+        ttl=settings['ttl'],
+        max_entries=settings['max_entries'],
+        max_bytes=settings['max_bytes'],
+    )
+
+    if not settings['persistent']:
+        return memory
+
+    # Entries can't be told apart from those of other releases
+    if release == UNKNOWN:
+        logging.warning('The Rhea release is unknown, SPARQL results are only cached in process')
+        return memory
+
+    disk = SqliteCache(
+        path=settings['path'] or os.path.join(data.path, 'sparql_cache.sqlite'),
+        release=release,
+        ttl=settings['ttl'],
+        compress_threshold=settings['compress_threshold'],
+    )
+
+    return TieredCache(memory, disk)
+
+def stats() -> dict:
+    """
+    Returns the hit/miss counters of the query cache.
+    """
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
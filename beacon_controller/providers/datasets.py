@@ -0,0 +1,120 @@
+"""
+A registry of the datasets that are loaded once and then shared by every
+request (the enzyme and compound name tables, the xref store, the Biolink
+Model toolkit, ...).
+
+Each dataset is loaded at most once: the first caller runs its loader while
+holding the dataset's lock, and concurrent callers wait for and share the
+result instead of loading it again. A loader may return None when its dataset
+is unavailable (e.g. not built yet). That result is kept too, so an optional
+dataset isn't looked for again on every request, until `invalidate` is called
+(e.g. once the dataset has been built).
+
+Datasets registered to be preloaded are loaded by the startup warm-up (see
+controllers/warmup_controller.py) rather than on first use. The time each load
+took is kept for `stats`.
+"""
+
+import logging
+import threading
+
+from time import time
+
+class Registry(object):
+    def __init__(self):
+        self.loaders = {}
+        self.eager = {}
+        self.values = {}
+        self.locks = {}
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, name:str, loader, preload=True):
+        with self.lock:
+            self.loaders[name] = loader
+            self.eager[name] = preload
+            self.locks[name] = threading.RLock()
+
+    def get(self, name:str):
+        if name in self.values:
+            return self.values[name]
+
+        with self.locks[name]:
+            if name in self.values:
+                return self.values[name]
+
+            start = time()
+            value = self.loaders[name]()
+            elapsed = time() - start
+
+            self.metrics[name] = {'seconds' : round(elapsed, 3), 'loaded_at' : time()}
+            self.values[name] = value
+
+            if value is not None:
+                logging.info(f'Loaded {name} in {elapsed:.2f}s')
+            else:
+                logging.info(f'{name} is not available')
+
+        return value
+
+    def is_loaded(self, name:str) -> bool:
+        return self.values.get(name) is not None
+
+    def invalidate(self, name:str=None):
+        """
+        Forgets the given dataset (by default every dataset), so that the next
+        caller loads it again.
+        """
+        names = [name] if name is not None else list(self.loaders)
+
+        for name in names:
+            with self.locks[name]:
+                self.values.pop(name, None)
+                self.metrics.pop(name, None)
+
+    def preload(self, names=None):
+        """
+        Loads the given datasets (by default those registered to be
+        preloaded), logging rather than raising the errors of those that fail.
+        """
+        if names is None:
+            names = [name for name, eager in self.eager.items() if (eager() if callable(eager) else eager)]
+
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                logging.exception(f'Could not preload {name}')
+
+    def stats(self) -> dict:
+        return {
+            name : dict(self.metrics.get(name, {}), loaded=self.is_loaded(name))
+            for name in self.loaders
+        }
+
+registry = Registry()
+
+def dataset(name:str, preload=True):
+    """
+    Registers the decorated function as the loader of the named dataset, and
+    replaces it with one that returns the dataset from the registry. `preload`
+    (a bool, or a function returning one) says whether the dataset is loaded
+    by the startup warm-up.
+    """
+    def decorator(loader):
+        registry.register(name, loader, preload)
+
+        def get():
+            return registry.get(name)
+
+        get.__name__ = loader.__name__
+        get.__doc__ = loader.__doc__
+        return get
+
+    return decorator
+
+def stats() -> dict:
+    return registry.stats()
+
+def invalidate(name:str=None):
+    registry.invalidate(name)
@@ -0,0 +1,224 @@
+"""
+Materialized statement tables, one per const.Predicate, built from the graph
+snapshot (see providers/graph.py) by data/build_edges.py.
+
+Each table holds the distinct (subject, object, reaction) rows of the
+predicate sorted by subject, plus a permutation sorting them by object, so
+that statements for given subject or object CURIEs are found with a binary
+search instead of a remote UNION query. Citations are looked up through the
+reaction in the graph snapshot.
+"""
+
+import os
+import logging
+
+import numpy as np
+
+from itertools import islice
+from typing import List
+
+from config import config
+from beacon_controller.const import Category, Predicate
+from beacon_controller.providers import graph as rhea_graph
+from beacon_controller.providers.datasets import dataset
+
+class EdgeTable(object):
+    ARRAYS = ['subjects', 'objects', 'reactions', 'by_object']
+
+    def __init__(self, predicate:Predicate, subjects, objects, reactions, by_object):
+        self.predicate = predicate
+        self.subjects = subjects
+        self.objects = objects
+        self.reactions = reactions
+        self.by_object = by_object
+        self._sorted_objects = None
+
+    @classmethod
+    def from_edges(cls, edges:rhea_graph.Edges):
+        rows = np.unique(np.stack([edges.subjects, edges.objects, edges.reactions], axis=1).astype(np.int32), axis=0)
+        subjects, objects, reactions = rows[:, 0], rows[:, 1], rows[:, 2]
+        by_object = np.lexsort((reactions, subjects, objects)).astype(np.int32)
+        return cls(edges.predicate, subjects, objects, reactions, by_object)
+
+    def __len__(self):
+        return len(self.subjects)
+
+    def rows_for_subject(self, subject:int) -> range:
+        lo = np.searchsorted(self.subjects, subject, side='left')
+        hi = np.searchsorted(self.subjects, subject, side='right')
+        return range(lo, hi)
+
+    def rows_for_object(self, obj:int) -> np.ndarray:
+        if self._sorted_objects is None:
+            self._sorted_objects = np.asarray(self.objects)[self.by_object]
+        lo = np.searchsorted(self._sorted_objects, obj, side='left')
+        hi = np.searchsorted(self._sorted_objects, obj, side='right')
+        return self.by_object[lo:hi]
+
+    def save(self, path):
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{self.predicate.name}.{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, path, predicate:Predicate, mmap_mode='r'):
+        arrays = {name : np.load(os.path.join(path, f'{predicate.name}.{name}.npy'), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        return cls(predicate, **arrays)
+
+def build(g:rhea_graph.RheaGraph) -> dict:
+    return {predicate : EdgeTable.from_edges(g.edges(predicate)) for predicate in Predicate}
+
+def tables_path() -> str:
+    return os.path.join(rhea_graph.graph_path(), 'edges')
+
+def save(tables:dict, path:str):
+    os.makedirs(path, exist_ok=True)
+    for table in tables.values():
+        table.save(path)
+
+def load_tables():
+    """
+    Returns the statement tables if they are enabled in config.yaml and have
+    been built, otherwise None.
+    """
+    if not config['graph']['edge_tables']:
+        return None
+
+    return load_edge_tables()
+
+@dataset('edge_tables', preload=lambda: config['graph']['edge_tables'])
+def load_edge_tables():
+    path = tables_path()
+    g = rhea_graph.load_graph()
+
+    if g is None or not os.path.exists(os.path.join(path, f'{Predicate.participates_in.name}.subjects.npy')):
+        logging.warning(f'Statement tables are enabled but have not been built in {path}')
+        return None
+
+    return {predicate : EdgeTable.load(path, predicate) for predicate in Predicate}
+
+def node_indexes(g, category, curies):
+    if not isinstance(curies, list) or len(curies) == 0:
+        return None
+    indexes = (g.node_index(category, curie) for curie in curies)
+    return sorted({i for i in indexes if i is not None})
+
+def matches_keywords(name, keywords):
+    """
+    Mirrors rhea.build_substring_filter: a case insensitive substring match
+    on any keyword. Unnamed nodes never match.
+    """
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    if not isinstance(keywords, list) or len(keywords) == 0:
+        return True
+    if name is None:
+        return False
+    name = name.lower()
+    return any(k.lower() in name for k in keywords)
+
+def candidate_rows(table:EdgeTable, subjects, objects, first_subject=0):
+    """
+    Yields row positions in (subject, object) order, restricted to the given
+    subject and object indexes when they are not None, starting from the
+    first row whose subject is at least first_subject.
+    """
+    if subjects is not None:
+        object_set = set(objects) if objects is not None else None
+        for subject in subjects:
+            if subject < first_subject:
+                continue
+            for row in table.rows_for_subject(subject):
+                if object_set is None or table.objects[row] in object_set:
+                    yield row
+    elif objects is not None:
+        rows = np.concatenate([table.rows_for_object(o) for o in objects]) if objects else np.array([], dtype=np.int32)
+        rows = np.sort(rows)
+        yield from rows[np.asarray(table.subjects)[rows] >= first_subject]
+    else:
+        yield from range(np.searchsorted(table.subjects, first_subject, side='left'), len(table))
+
+def node_key(g, category, node_id:str) -> int:
+    """
+    The inverse of RheaGraph.node_id. Raises ValueError for unknown nodes.
+    """
+    if category is Category.protein:
+        i = g.ec_numbers.index(node_id.replace(rhea_graph.EC_URI, ''))
+    else:
+        i = g.nodes(category).index(node_id)
+    if i is None:
+        raise ValueError(f'Unknown {category.name} {node_id}')
+    return i
+
+def iter_records(tables:dict, predicates:List[Predicate], s=None, t=None, s_keywords=None, t_keywords=None, get_citations=False, after=None):
+    """
+    Yields statements in the same shape as the SPARQL bindings returned by
+    statements_controller.get_records, in order of subject and then object
+    id. Rows of the same subject and object that come from different
+    reactions are merged into one statement, and their citations are
+    combined. When after is a (subject id, object id) pair only the
+    statements that come after it are yielded.
+    """
+    g = rhea_graph.load_graph()
+
+    for predicate in predicates:
+        table = tables[predicate]
+
+        subjects = node_indexes(g, predicate.domain, s)
+        objects = node_indexes(g, predicate.codomain, t)
+
+        if subjects == [] or objects == []:
+            continue
+
+        start = None
+        if after is not None:
+            start = (node_key(g, predicate.domain, after[0]), node_key(g, predicate.codomain, after[1]))
+
+        current, reactions = None, []
+
+        def record(key, reactions):
+            subject, obj = key
+            subject_name = g.node_name(predicate.domain, subject)
+            object_name = g.node_name(predicate.codomain, obj)
+
+            if not matches_keywords(subject_name, s_keywords) or not matches_keywords(object_name, t_keywords):
+                return None
+
+            d = {
+                'subjectId' : {'value' : g.node_id(predicate.domain, subject)},
+                'objectId' : {'value' : g.node_id(predicate.codomain, obj)},
+                'edge_label' : {'value' : predicate.edge_label},
+                'relation' : {'value' : predicate.relation},
+            }
+            if subject_name is not None:
+                d['subjectName'] = {'value' : subject_name}
+            if object_name is not None:
+                d['objectName'] = {'value' : object_name}
+            if get_citations:
+                citations = []
+                for reaction in reactions:
+                    citations.extend(c for c in g.citations_of(reaction) if c not in citations)
+                d['citations'] = {'value' : '|'.join(citations)}
+            return d
+
+        for row in candidate_rows(table, subjects, objects, start[0] if start is not None else 0):
+            key = (int(table.subjects[row]), int(table.objects[row]))
+            if start is not None and key <= start:
+                continue
+            if key != current:
+                if current is not None:
+                    d = record(current, reactions)
+                    if d is not None:
+                        yield d
+                current, reactions = key, []
+            reactions.append(int(table.reactions[row]))
+
+        if current is not None:
+            d = record(current, reactions)
+            if d is not None:
+                yield d
+
+def get_records(tables:dict, predicates:List[Predicate], s=None, t=None, s_keywords=None, t_keywords=None, size=None, offset=None, get_citations=False, after=None):
+    records = iter_records(tables, predicates, s, t, s_keywords, t_keywords, get_citations, after)
+    start = offset if isinstance(offset, int) and offset >= 0 else 0
+    stop = start + size if isinstance(size, int) and size >= 0 else None
+    return list(islice(records, start, stop))
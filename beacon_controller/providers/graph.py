@@ -0,0 +1,391 @@
+"""
+A compact, array-backed snapshot of the approved Rhea reaction graph:
+reactions, their sides (with curatedOrder), the compounds participating in
+each side, the EC numbers catalysing each reaction, and each reaction's
+citations.
+
+Accessions are interned as integers in sorted order, so comparing two indexes
+is the same as comparing the identifiers they stand for. Adjacency is kept in
+CSR form (a pointer array plus a flat array of neighbours). Everything is
+stored as .npy files in a directory built by data/build_graph.py, and loaded
+with memory-mapping so that worker processes on a host share the same pages.
+
+Each const.Predicate can be evaluated over the snapshot as array joins with
+`RheaGraph.edges`.
+"""
+
+import os
+import json
+
+import numpy as np
+
+import data
+
+from collections import namedtuple
+
+from config import config
+from beacon_controller.const import Category, Predicate
+from beacon_controller.providers.datasets import dataset
+
+EC_URI = 'http://purl.uniprot.org/enzyme/'
+
+# subjects and objects are indexes into the node table of the predicate's
+# domain and codomain category respectively
+Edges = namedtuple('Edges', ['predicate', 'subjects', 'objects', 'reactions'])
+
+class StringTable(object):
+    """
+    An immutable list of strings stored as one UTF-8 blob and an array of
+    offsets into it, so that it can be saved and memory-mapped like any other
+    array.
+    """
+
+    def __init__(self, offsets:np.ndarray, blob:np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(offsets, blob)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i) -> str:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def lower_bound(self, s:str) -> int:
+        """
+        Returns the position of the first string that is not less than s, for
+        a table whose strings are sorted (as Python sorts them, which is also
+        the order of their UTF-8 encodings).
+        """
+        key = s.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self.blob[self.offsets[mid]:self.offsets[mid + 1]]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def index(self, s:str):
+        """
+        Returns the position of the given string in a sorted table, or None.
+        Binary searches the (possibly memory-mapped) arrays rather than
+        building a dict of every string.
+        """
+        i = self.lower_bound(s)
+        if i < len(self) and self[i] == s:
+            return i
+        return None
+
+    def save(self, path, name):
+        np.save(os.path.join(path, f'{name}.offsets.npy'), self.offsets)
+        np.save(os.path.join(path, f'{name}.blob.npy'), self.blob)
+
+    @classmethod
+    def load(cls, path, name, mmap_mode='r'):
+        return cls(
+            np.load(os.path.join(path, f'{name}.offsets.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, f'{name}.blob.npy'), mmap_mode=mmap_mode)
+        )
+
+def csr(rows:np.ndarray, n:int):
+    """
+    Given the (sorted) row of each entry, returns the CSR pointer array for n
+    rows.
+    """
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=ptr[1:])
+    return ptr
+
+def expand(ptr:np.ndarray) -> np.ndarray:
+    """
+    The inverse of csr: returns the row of each entry.
+    """
+    return np.repeat(np.arange(len(ptr) - 1, dtype=np.int32), np.diff(ptr))
+
+def join(left:np.ndarray, right:np.ndarray):
+    """
+    Equi-join on two key arrays. Returns index arrays (i, j) of every pair with
+    left[i] == right[j].
+    """
+    order = np.argsort(right, kind='stable')
+    sorted_right = right[order]
+
+    lo = np.searchsorted(sorted_right, left, side='left')
+    hi = np.searchsorted(sorted_right, left, side='right')
+    counts = hi - lo
+
+    i = np.repeat(np.arange(len(left)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    j = order[np.repeat(lo, counts) + np.arange(len(i)) - starts]
+
+    return i, j
+
+class RheaGraph(object):
+    STRING_TABLES = [
+        'reaction_accessions', 'reaction_equations',
+        'compound_accessions', 'compound_names',
+        'ec_numbers', 'citations',
+    ]
+
+    ARRAYS = [
+        'reaction_side_ptr', 'side_orders',
+        'side_participant_ptr', 'participant_compounds',
+        'reaction_ec_ptr', 'reaction_ecs',
+        'reaction_citation_ptr', 'reaction_citations',
+    ]
+
+    def __init__(self, release=None, **arrays):
+        self.release = release
+        for name in self.STRING_TABLES + self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+        self._participants = None
+
+    @property
+    def participants(self):
+        """
+        Flattened participant level view: the reaction, side order, compound
+        and side of every participant of every side.
+        """
+        if self._participants is None:
+            sides = expand(self.side_participant_ptr)
+            side_reactions = expand(self.reaction_side_ptr)
+            self._participants = (
+                side_reactions[sides],
+                np.asarray(self.side_orders)[sides],
+                np.asarray(self.participant_compounds),
+                sides,
+            )
+        return self._participants
+
+    def nodes(self, category:Category) -> StringTable:
+        if category is Category.chemical_substance:
+            return self.compound_accessions
+        elif category is Category.protein:
+            return self.ec_numbers
+        elif category is Category.molecular_activity:
+            return self.reaction_accessions
+
+    def node_id(self, category:Category, i:int) -> str:
+        """
+        The identifier of the node as the SPARQL endpoint binds it.
+        """
+        if category is Category.protein:
+            return EC_URI + self.ec_numbers[i]
+        return self.nodes(category)[i]
+
+    def node_name(self, category:Category, i:int):
+        if category is Category.chemical_substance:
+            return self.compound_names[i]
+        elif category is Category.molecular_activity:
+            return self.reaction_equations[i]
+        return None
+
+    def node_index(self, category:Category, curie:str):
+        """
+        Looks up a node by its CURIE, returning None if it is not in the graph.
+        """
+        curie = curie.upper()
+        if category is Category.protein:
+            if not curie.startswith('EC:'):
+                return None
+            return self.ec_numbers.index(curie.split(':', 1)[1])
+        return self.nodes(category).index(curie)
+
+    def citations_of(self, reaction:int):
+        lo, hi = self.reaction_citation_ptr[reaction], self.reaction_citation_ptr[reaction + 1]
+        return [self.citations[c] for c in self.reaction_citations[lo:hi]]
+
+    def edges(self, predicate:Predicate) -> Edges:
+        """
+        Evaluates the predicate's graph pattern, with the same multiplicity
+        as the SPARQL query in const.Predicate would give.
+        """
+        p_reactions, p_orders, p_compounds, p_sides = self.participants
+
+        ec_reactions = expand(self.reaction_ec_ptr)
+        ecs = np.asarray(self.reaction_ecs)
+
+        if predicate is Predicate.molecularly_interacts_with:
+            i, j = join(p_sides, p_sides)
+            keep = i != j
+            i, j = i[keep], j[keep]
+            return Edges(predicate, p_compounds[i], p_compounds[j], p_reactions[i])
+
+        elif predicate is Predicate.derives_into:
+            left, = np.nonzero(p_orders == 1)
+            right, = np.nonzero(p_orders == 2)
+            i, j = join(p_reactions[left], p_reactions[right])
+            i, j = left[i], right[j]
+            return Edges(predicate, p_compounds[i], p_compounds[j], p_reactions[i])
+
+        elif predicate in (Predicate.increases_synthesis_of, Predicate.increases_degradation_of):
+            order = 2 if predicate is Predicate.increases_synthesis_of else 1
+            side, = np.nonzero(p_orders == order)
+            i, j = join(ec_reactions, p_reactions[side])
+            j = side[j]
+            return Edges(predicate, ecs[i], p_compounds[j], ec_reactions[i])
+
+        elif predicate is Predicate.participates_in:
+            return Edges(predicate, p_compounds, p_reactions, p_reactions)
+
+        elif predicate is Predicate.increases_activity_of:
+            return Edges(predicate, ecs, ec_reactions, ec_reactions)
+
+        elif predicate is Predicate.catalyzes_same_reaction:
+            i, j = join(ec_reactions, ec_reactions)
+            keep = ecs[i] < ecs[j]
+            i, j = i[keep], j[keep]
+            return Edges(predicate, ecs[i], ecs[j], ec_reactions[i])
+
+        elif predicate is Predicate.has_same_catalyst:
+            i, j = join(ecs, ecs)
+            keep = ec_reactions[i] < ec_reactions[j]
+            i, j = i[keep], j[keep]
+            return Edges(predicate, ec_reactions[i], ec_reactions[j], ec_reactions[i])
+
+        raise Exception(f'No array evaluation for {predicate}')
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self.STRING_TABLES:
+            getattr(self, name).save(path, name)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'release' : self.release}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        arrays = {}
+        for name in cls.STRING_TABLES:
+            arrays[name] = StringTable.load(path, name, mmap_mode)
+        for name in cls.ARRAYS:
+            arrays[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        return cls(release=meta.get('release'), **arrays)
+
+APPROVED = """
+    ?reaction rdfs:subClassOf rh:Reaction .
+    ?reaction rh:status rh:Approved .
+    ?reaction rh:accession ?accession .
+"""
+
+def build(get_records, release=None) -> RheaGraph:
+    """
+    Builds the snapshot from the results of a handful of bulk queries, run
+    with the given function (normally rhea.get_records).
+    """
+    def select(variables, pattern):
+        return get_records(f"""
+        PREFIX rh:<http://rdf.rhea-db.org/>
+        SELECT {variables} WHERE {{
+            {APPROVED}
+            {pattern}
+        }}
+        """)
+
+    def value(record, key):
+        return record[key]['value']
+
+    reactions = {}
+    for r in select('?accession ?equation', '?reaction rh:equation ?equation .'):
+        reactions[value(r, 'accession')] = value(r, 'equation')
+
+    participants = select('?accession ?side ?order ?participant ?compoundAc ?compoundName', """
+        ?reaction rh:side ?side .
+        ?side rh:curatedOrder ?order .
+        ?side rh:contains ?participant .
+        ?participant rh:compound ?compound .
+        ?compound rh:accession ?compoundAc .
+        ?compound rh:name ?compoundName .
+    """)
+
+    ec_records = select('?accession ?ec', '?reaction rh:ec ?ec .')
+    citation_records = select('?accession ?citation', '?reaction rh:citation ?citation .')
+
+    reaction_accessions = sorted(reactions)
+    reaction_index = {a : i for i, a in enumerate(reaction_accessions)}
+
+    compound_names = {}
+    sides = {}
+    for r in participants:
+        if value(r, 'accession') not in reaction_index:
+            continue
+        compound_names.setdefault(value(r, 'compoundAc'), value(r, 'compoundName'))
+        key = (reaction_index[value(r, 'accession')], value(r, 'side'))
+        sides.setdefault(key, (int(value(r, 'order')), {}))[1][value(r, 'participant')] = value(r, 'compoundAc')
+
+    compound_accessions = sorted(compound_names)
+    compound_index = {a : i for i, a in enumerate(compound_accessions)}
+
+    side_keys = sorted(sides)
+    side_reactions = np.array([reaction for reaction, _ in side_keys], dtype=np.int32)
+    side_orders = np.array([sides[k][0] for k in side_keys], dtype=np.int8)
+    side_compounds = [sorted(compound_index[c] for c in sides[k][1].values()) for k in side_keys]
+
+    side_participant_ptr = np.zeros(len(side_keys) + 1, dtype=np.int64)
+    side_participant_ptr[1:] = np.cumsum([len(c) for c in side_compounds])
+    participant_compounds = np.array([c for compounds in side_compounds for c in compounds], dtype=np.int32)
+
+    def adjacency(records, key, transform=lambda s: s):
+        pairs = set()
+        for r in records:
+            if value(r, 'accession') in reaction_index:
+                pairs.add((reaction_index[value(r, 'accession')], transform(value(r, key))))
+        vocabulary = sorted({v for _, v in pairs})
+        index = {v : i for i, v in enumerate(vocabulary)}
+        pairs = sorted((reaction, index[v]) for reaction, v in pairs)
+        rows = np.array([reaction for reaction, _ in pairs], dtype=np.int32)
+        columns = np.array([v for _, v in pairs], dtype=np.int32)
+        return vocabulary, csr(rows, len(reaction_accessions)), columns
+
+    ec_numbers, reaction_ec_ptr, reaction_ecs = adjacency(ec_records, 'ec', lambda s: s.replace(EC_URI, ''))
+    citations, reaction_citation_ptr, reaction_citations = adjacency(citation_records, 'citation')
+
+    return RheaGraph(
+        release=release,
+        reaction_accessions=StringTable.from_strings(reaction_accessions),
+        reaction_equations=StringTable.from_strings(reactions[a] for a in reaction_accessions),
+        compound_accessions=StringTable.from_strings(compound_accessions),
+        compound_names=StringTable.from_strings(compound_names[a] for a in compound_accessions),
+        ec_numbers=StringTable.from_strings(ec_numbers),
+        citations=StringTable.from_strings(citations),
+        reaction_side_ptr=csr(side_reactions, len(reaction_accessions)),
+        side_orders=side_orders,
+        side_participant_ptr=side_participant_ptr,
+        participant_compounds=participant_compounds,
+        reaction_ec_ptr=reaction_ec_ptr,
+        reaction_ecs=reaction_ecs,
+        reaction_citation_ptr=reaction_citation_ptr,
+        reaction_citations=reaction_citations,
+    )
+
+def graph_path() -> str:
+    return config['graph']['path'] or os.path.join(data.path, 'graph')
+
+@dataset('graph')
+def load_graph():
+    """
+    Returns the memory-mapped snapshot, or None if it has not been built.
+    """
+    path = graph_path()
+
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+
+    return RheaGraph.load(path)
@@ -0,0 +1,115 @@
+"""
+Answers SPARQL queries in process against a downloaded Rhea RDF dump instead
+of the remote endpoint. Used when `provider` is set to "local" in
+config/config.yaml. Requires rdflib, and the dump downloaded with
+`make local` in the data directory.
+
+The dump is parsed once into an rdflib in-memory store, which keeps
+subject/predicate/object indexes so the triple patterns in const.Predicate and
+providers/rhea.py are answered with index lookups. The queries are written
+for the Rhea endpoint, and are rewritten where rdflib would evaluate them
+differently (see rewrite).
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+
+import data
+
+from config import config
+from beacon_controller.providers.datasets import dataset
+
+try:
+    import rdflib
+    from rdflib.namespace import RDF, RDFS
+    from rdflib.plugins.sparql import prepareQuery
+except ImportError:
+    rdflib = None
+
+lock = threading.Lock()
+
+# Triple patterns with a numeric literal object (e.g. `?side rh:curatedOrder
+# 1 .`), which rdflib only matches to a literal of the very same datatype
+LITERAL_PATTERN = re.compile(r'(\?\w+)\s+(rh:\w+)\s+(\d+)\s*\.')
+
+# Comparisons of two variables bound to IRIs, which rdflib doesn't order
+IRI_COMPARISON = re.compile(r'FILTER\s*\(\s*(\?\w+)\s*<\s*(\?\w+)\s*\)')
+
+def namespaces() -> dict:
+    """
+    The prefixes that the Rhea endpoint predefines, and which our queries
+    therefore use without declaring.
+    """
+    return {
+        'rdf' : RDF,
+        'rdfs' : RDFS,
+        'rh' : rdflib.Namespace('http://rdf.rhea-db.org/'),
+        'ec' : rdflib.Namespace('http://purl.uniprot.org/enzyme/'),
+        'EC' : rdflib.Namespace('http://purl.uniprot.org/enzyme/'),
+        'pubmed' : rdflib.Namespace('http://rdf.ncbi.nlm.nih.gov/pubmed/'),
+        'ch' : rdflib.Namespace('http://purl.obolibrary.org/obo/'),
+    }
+
+def rdf_path() -> str:
+    return config['local']['rdf_path'] or os.path.join(data.path, 'rhea.rdf')
+
+@dataset('rdf', preload=lambda: config['provider'] == 'local')
+def load_graph():
+    if rdflib is None:
+        raise Exception('rdflib must be installed to use the local provider')
+
+    path = rdf_path()
+
+    if not os.path.exists(path):
+        raise Exception(f'Could not find the Rhea RDF dump at {path}, run `make local` in the data directory')
+
+    g = rdflib.Graph()
+    g.parse(path, format='xml')
+
+    logging.info(f'Parsed {len(g)} triples from {path}')
+
+    return g
+
+def rewrite(sparql_query:str) -> str:
+    """
+    Rewrites the parts of a query written for the Rhea endpoint that rdflib
+    evaluates differently: numeric literal objects are matched by value in a
+    FILTER, and IRIs are compared as strings.
+    """
+    count = 0
+
+    def literal(match):
+        nonlocal count
+        count += 1
+        subject, predicate, value = match.groups()
+        return f'{subject} {predicate} ?literal{count} . FILTER (?literal{count} = {value}) .'
+
+    sparql_query = LITERAL_PATTERN.sub(literal, sparql_query)
+
+    return IRI_COMPARISON.sub(r'FILTER (str(\1) < str(\2))', sparql_query)
+
+def query(sparql_query):
+    """
+    Evaluates the query against the local graph, returning the results in the
+    SPARQL JSON results format along with the size of the serialized body, the
+    same as rhea.fetch does for the remote endpoint.
+
+    rdflib's query parser is not thread safe, so queries are parsed one at a
+    time. The graph is only read once it has been loaded, so the parsed
+    queries are evaluated concurrently.
+
+    rdflib serializes a grouped query without any solutions (e.g. the
+    citations query of a statement that doesn't exist) as a single empty
+    binding, which the endpoint doesn't return, so empty bindings are dropped.
+    """
+    g = load_graph()
+    with lock:
+        prepared = prepareQuery(rewrite(sparql_query), initNs=namespaces())
+    result = g.query(prepared)
+    body = result.serialize(format='json')
+    results = json.loads(body)
+    results['results']['bindings'] = [binding for binding in results['results']['bindings'] if binding]
+    return results, len(body)
@@ -1,9 +1,40 @@
 # https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi?db=pubmed&id=10684596,12753071&retmode=json&tool=knowledge_beacon&email=lance@starinformatics.com
 
+"""
+Article summaries (title, publication date, ...) from NCBI's esummary service.
+
+Summaries are kept in a SQLite file (by default data/pubmed.sqlite) shared by
+every worker on the host, so each PMID is fetched once. The PMIDs that aren't
+cached are fetched in chunks, concurrently. Before each request a thread
+reserves the next free slot in a table of the same file, which spaces the
+requests of every worker on the host so that together they stay within
+NCBI's rate limit (with the cache disabled, the limit only spans the
+process). Requests that fail are logged and their summaries left out, while
+those fetched by the other requests are still cached. Settings are in the
+`pubmed` section of config/config.yaml.
+
+`make pubmed` in the data directory fills the store with the summaries of
+every article Rhea cites (see data/build_pubmed.py), after which the beacon
+can run with `offline` set and make no NCBI requests at all.
+"""
+
+import os
+import json
+import logging
+import sqlite3
+import threading
+
 import requests
+
+import data
+
+from concurrent.futures import ThreadPoolExecutor
 from time import time, sleep
 from typing import List, Union
 
+from config import config
+from beacon_controller.providers import transport
+
 BASE_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi'
 URI='http://rdf.ncbi.nlm.nih.gov/pubmed/'
 
@@ -13,9 +44,208 @@ def partition_generator(l, n):
     for i in range(0, len(l), n):
         yield l[i:i + n]
 
+def normalize_pmid(pmid:str) -> str:
+    return pmid.upper().replace('PMID:', '').replace('PUBMED:', '').replace(URI.upper(), '')
+
+class TokenBucket(object):
+    """
+    Allows `rate` acquisitions per second on average, and bursts of up to
+    `capacity`. Thread safe: callers block until their token is available.
+    """
+
+    def __init__(self, rate:float, capacity:float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            # Taking the token now (possibly going into debt) reserves this
+            # caller's place, so waiting happens outside of the lock
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0:
+            sleep(wait)
+
+def thread_connection(local:threading.local, path:str, **kwargs) -> sqlite3.Connection:
+    """
+    Returns the calling thread's connection to the SQLite file, opening it
+    (in WAL mode) on first use in each thread and forked process.
+    """
+    pid = os.getpid()
+
+    if getattr(local, 'pid', None) != pid:
+        conn = sqlite3.connect(path, timeout=30, **kwargs)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        local.conn = conn
+        local.pid = pid
+
+    return local.conn
+
+class SharedRateLimiter(object):
+    """
+    Allows `rate` acquisitions per second across every process that uses the
+    same SQLite file: each caller reserves the next free slot, 1 / rate
+    seconds after the previous one, and waits for it.
+    """
+
+    def __init__(self, path, rate:float, name='ncbi'):
+        self.path = path
+        self.rate = rate
+        self.name = name
+
+        self._local = threading.local()
+
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                name TEXT PRIMARY KEY,
+                next_at REAL NOT NULL
+            )
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Transactions are managed explicitly
+        return thread_connection(self._local, self.path, isolation_level=None)
+
+    def acquire(self):
+        conn = self._connection()
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time()
+            row = conn.execute('SELECT next_at FROM rate_limits WHERE name = ?', [self.name]).fetchone()
+            slot = max(now, row[0]) if row is not None else now
+            conn.execute('INSERT OR REPLACE INTO rate_limits (name, next_at) VALUES (?, ?)', [self.name, slot + 1 / self.rate])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        if slot > now:
+            sleep(slot - now)
+
+class SummaryCache(object):
+    """
+    PMID to summary, stored in a SQLite database opened in WAL mode, with a
+    connection per thread (and forked process).
+    """
+
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    pmid TEXT PRIMARY KEY,
+                    created REAL NOT NULL,
+                    value TEXT NOT NULL
+                )
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path)
+
+    def get_many(self, pmids:List[str]) -> dict:
+        """
+        Returns the cached summaries of the given PMIDs, leaving out those that
+        aren't cached.
+        """
+        d = {}
+        oldest = time() - self.ttl if self.ttl is not None else 0
+
+        for chunk in partition_generator(pmids, 500):
+            rows = self._connection().execute(
+                f'SELECT pmid, value FROM summaries WHERE created >= ? AND pmid IN ({",".join("?" * len(chunk))})',
+                [oldest] + chunk
+            )
+            for pmid, value in rows:
+                d[pmid] = json.loads(value)
+
+        self.hits += len(d)
+        self.misses += len(pmids) - len(d)
+
+        return d
+
+    def put_many(self, summaries:dict):
+        now = time()
+        with self._connection() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO summaries (pmid, created, value) VALUES (?, ?, ?)',
+                [(pmid, now, json.dumps(summary, separators=(',', ':'))) for pmid, summary in summaries.items()]
+            )
+
+    def stats(self) -> dict:
+        return {'hits' : self.hits, 'misses' : self.misses}
+
+limiter = None
+summary_cache = None
+executor = None
+lock = threading.Lock()
+
+def get_limiter():
+    """
+    Returns the rate limiter shared by the workers on the host (kept in the
+    summary cache's file), or with the cache disabled one for this process.
+    """
+    global limiter
+    if limiter is None:
+        with lock:
+            if limiter is None:
+                settings = config['pubmed']
+                rate = settings['rate_with_api_key'] if settings['api_key'] else settings['rate']
+                if settings['cache']:
+                    limiter = SharedRateLimiter(cache_path(), rate)
+                else:
+                    # No bursts: NCBI counts requests in any one second window
+                    limiter = TokenBucket(rate=rate, capacity=1)
+    return limiter
+
+def cache_path() -> str:
+    return config['pubmed']['cache_path'] or os.path.join(data.path, 'pubmed.sqlite')
+
+def get_summary_cache():
+    """
+    Returns the shared summary cache, or None if it is disabled.
+    """
+    global summary_cache
+    settings = config['pubmed']
+    if not settings['cache']:
+        return None
+    if summary_cache is None:
+        with lock:
+            if summary_cache is None:
+                summary_cache = SummaryCache(
+                    path=cache_path(),
+                    ttl=settings['cache_ttl'],
+                )
+    return summary_cache
+
+def get_executor() -> ThreadPoolExecutor:
+    global executor
+    if executor is None:
+        with lock:
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=config['pubmed']['max_workers'])
+    return executor
+
 class PubMedRetreiver(object):
     """
-    This object makes at most three requests per second.
+    Fetches article summaries, from the shared cache where possible. All
+    instances share one rate limit.
 
     In the future this should be extended to retreive abstracts too.
     """
@@ -24,34 +254,67 @@ class PubMedRetreiver(object):
         self.tool = tool
         self.email = email
         self.retmode = retmode
-        self.last_time = time()
+
+    def fetch(self, pmids:List[str]) -> dict:
+        """
+        Fetches the summaries of up to one chunk of PMIDs from NCBI.
+        """
+        params = dict(
+            db='pubmed',
+            retmode=self.retmode,
+            id=','.join(pmids),
+            tool=self.tool,
+            email=self.email
+        )
+
+        api_key = config['pubmed']['api_key']
+        if api_key:
+            params['api_key'] = api_key
+
+        get_limiter().acquire()
+
+        try:
+            response = transport.get(config['pubmed']['base_url'] or BASE_URL, params=params)
+        except requests.RequestException as e:
+            logging.warning(f'Could not fetch {len(pmids)} PubMed summaries: {e}')
+            return {}
+
+        if not response.ok:
+            logging.warning(f'Could not fetch {len(pmids)} PubMed summaries: HTTP {response.status_code}')
+            return {}
+
+        try:
+            result = response.json().get('result', {})
+        except (ValueError, AttributeError):
+            # e.g. an HTML error page served with a 200
+            logging.warning(f'Could not fetch {len(pmids)} PubMed summaries: the response is not the expected JSON')
+            return {}
+
+        return {pmid : result[pmid] for pmid in pmids if isinstance(result, dict) and isinstance(result.get(pmid), dict)}
 
     def get(self, pmid:Union[List[str], str]) -> dict:
         if isinstance(pmid, str):
-            return get([pmid])
+            return self.get([pmid])
         elif isinstance(pmid, list):
-            pmids = [p.upper().replace('PMID:', '').replace('PUBMED:', '').replace(URI.upper(), '') for p in pmid]
+            pmids = list(dict.fromkeys(normalize_pmid(p) for p in pmid))
 
-            d = {}
+            cache = get_summary_cache()
 
-            for pmids in partition_generator(pmids, 50):
-                params = dict(
-                    db='pubmed',
-                    retmode=self.retmode,
-                    id=','.join(pmids),
-                    tool=self.tool,
-                    email=self.email
-                )
+            d = cache.get_many(pmids) if cache is not None else {}
 
-                delta = time() - self.last_time
-                if delta < 1/3.0:
-                    sleep(1/3.0 - delta)
+            misses = [p for p in pmids if p not in d]
 
-                response = requests.get(BASE_URL, params=params)
+            if misses and config['pubmed']['offline']:
+                logging.warning(f'{len(misses)} PubMed summaries are not in the local store')
+            elif misses:
+                chunks = partition_generator(misses, config['pubmed']['chunk_size'])
+                fetched = {}
+                for result in get_executor().map(self.fetch, chunks):
+                    fetched.update(result)
 
-                self.last_time = time()
+                if cache is not None and fetched:
+                    cache.put_many(fetched)
 
-                if response.ok:
-                    d.update(response.json().get('result'))
+                d.update(fetched)
 
             return d
@@ -0,0 +1,117 @@
+"""
+Determines which Rhea release the beacon is serving. Anything persisted across
+restarts (response caches, snapshots) is tagged with this value so that it is
+discarded once Rhea publishes a new release.
+"""
+
+import os
+import logging
+import threading
+
+import data
+
+from time import time
+
+from config import config
+
+RELEASE_URL = 'https://ftp.expasy.org/databases/rhea/rhea-release.properties'
+RELEASE_FILE = os.path.join(data.path, 'rhea-release.properties')
+
+UNKNOWN = 'unknown'
+
+# Seconds to wait for the release properties from the FTP server
+FETCH_TIMEOUT = 10
+
+release = None
+checked_at = None
+refreshing = False
+lock = threading.Lock()
+
+def parse_properties(text:str) -> dict:
+    d = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line == '' or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        d[key.strip()] = value.strip()
+    return d
+
+def load_properties() -> dict:
+    """
+    Reads the release properties downloaded by data/Makefile, falling back to
+    fetching them from the Rhea FTP server.
+    """
+    if os.path.exists(RELEASE_FILE):
+        with open(RELEASE_FILE, 'r') as f:
+            return parse_properties(f.read())
+
+    from beacon_controller.providers import transport
+
+    try:
+        response = transport.get(RELEASE_URL, timeout=FETCH_TIMEOUT)
+        if response.ok:
+            return parse_properties(response.text)
+    except Exception as e:
+        logging.warning(f'Could not retrieve the Rhea release from {RELEASE_URL}: {e}')
+
+    return {}
+
+def lookup() -> str:
+    """
+    Looks the release up now, which takes an HTTP request when the properties
+    haven't been downloaded. A lookup that fails keeps the release found
+    before.
+    """
+    global release, checked_at
+
+    found = load_properties().get('rhea.release.number', UNKNOWN)
+
+    with lock:
+        if found != UNKNOWN or release is None:
+            if release is not None and found != release:
+                logging.info(f'Rhea release changed from {release} to {found}')
+            release = found
+        checked_at = time()
+
+    return release
+
+def refresh_in_background():
+    global refreshing
+
+    with lock:
+        if refreshing:
+            return
+        refreshing = True
+
+    def run():
+        global refreshing
+        try:
+            lookup()
+        except Exception:
+            logging.exception('Could not look up the Rhea release')
+        finally:
+            refreshing = False
+
+    threading.Thread(target=run, name='rhea-release', daemon=True).start()
+
+def get_release(wait=False) -> str:
+    """
+    Returns the Rhea release number. The `rhea_release` config value takes
+    precedence when it is set. Otherwise the release is looked up again every
+    `rhea_release_check_interval` seconds, so that a new release is noticed
+    without a restart.
+
+    Unless wait is set the lookup is made in a background thread, so that
+    requests never wait on it, and UNKNOWN is returned until the first one
+    has finished. Warm-up looks the release up at startup.
+    """
+    if config['rhea_release'] is not None:
+        return str(config['rhea_release'])
+
+    if checked_at is None or time() - checked_at > config['rhea_release_check_interval']:
+        if wait:
+            return lookup()
+        refresh_in_background()
+
+    return release if release is not None else UNKNOWN
@@ -1,33 +1,59 @@
-import requests, string, data, os
+import string, data, os
 import pandas as pd
 
+from beacon_controller.providers import cache, local, transport
+from beacon_controller.providers.sparql_json import BindingsParser
+from beacon_controller.providers.datasets import dataset
 from beacon_controller.providers.search import search
+from beacon_controller.providers.singleflight import SingleFlight
 from collections import defaultdict
 
 import logging
 
 from typing import List
 
-ec_df = None
+from config import config
 
+SPARQL_ENDPOINT = 'https://sparql.rhea-db.org/sparql'
+
+# Bytes read from the response at a time when streaming results
+STREAM_CHUNK_SIZE = 65536
+
+# Identical queries issued concurrently share a single upstream request
+in_flight = SingleFlight()
+
+@dataset('enzymes')
 def load_enzyme_df():
-    global ec_df
-    if ec_df is None:
-        ec_df = pd.read_csv(os.path.join(data.path, 'ecc_names.csv'), sep='\t')
-    return ec_df
+    return pd.read_csv(os.path.join(data.path, 'ecc_names.csv'), sep='\t')
+
+@dataset('compounds')
+def load_compound_df():
+    """
+    Returns the compound index built by data/build_compounds.py, or None if
+    it has not been built.
+    """
+    path = os.path.join(data.path, 'compound_names.csv')
+    if os.path.exists(path):
+        return pd.read_csv(path, sep='\t', dtype={'ID' : str, 'ChEBI' : str, 'Name' : str})
+    return None
+
+@dataset('enzyme_index')
+def load_enzyme_index():
+    """
+    Returns a dict of EC number (without prefix) to its record in
+    ecc_names.csv, built once so lookups don't scan the dataframe.
+    """
+    index = {}
+    for record in load_enzyme_df().to_dict(orient='records'):
+        if record['ID'] in index:
+            logging.warning(f'There were multiple records matching {record["ID"]} in dataframe')
+        else:
+            index[record['ID']] = record
+    return index
 
 def get_enzyme(ec_curie):
     ec_curie = ec_curie.lower().replace('ec:', '')
-    df = load_enzyme_df()
-    df = df.loc[df['ID'] == ec_curie]
-    records = df.to_dict(orient='records')
-    if len(records) < 1:
-        return None
-    elif len(records) > 1:
-        logging.warn(f'There were multiple records matching {ec_curie} in dataframe')
-        return records[0]
-    else:
-        return records[0]
+    return load_enzyme_index().get(ec_curie)
 
 def get_enzyme_name(ec_curie):
     enzyme = get_enzyme(ec_curie)
@@ -36,11 +62,23 @@ def get_enzyme_name(ec_curie):
     else:
         return None
 
+def get_enzyme_names(ec_curies:List[str]) -> List[str]:
+    """
+    Returns the name of each of the given EC CURIEs (None where unknown).
+    """
+    index = load_enzyme_index()
+    names = []
+    for ec_curie in ec_curies:
+        enzyme = index.get(ec_curie.lower().replace('ec:', ''))
+        names.append(enzyme['Name'] if enzyme is not None else None)
+    return names
+
 def find_enzymes(keywords, offset=None, size=None, metadata=False):
     return search(
         df=load_enzyme_df(),
         columns=['Name', 'Synonyms'],
         keywords=keywords,
+        column_multiplier={'Name' : 2, 'Synonyms' : 1},
         unique_columns='ID',
         offset=offset,
         size=size,
@@ -94,15 +132,47 @@ def curies_exist(c:List[str]):
     # }
 
 def get(sparql_query):
-    response = requests.get(
-        url="https://sparql.rhea-db.org/sparql",
+    """
+    Returns the SPARQL JSON results for the given query, answering from the
+    query cache when possible. Concurrent callers with the same normalized
+    query wait on a single upstream request. The returned dict may be shared
+    with other callers and must not be mutated.
+    """
+    query_cache = cache.get_cache()
+
+    key = cache.make_key(sparql_query)
+
+    if query_cache is not None:
+        result = query_cache.get(key)
+        if result is not None:
+            return result
+
+    def fetch_and_cache():
+        result, size = fetch(sparql_query)
+        if query_cache is not None:
+            query_cache.put(key, result, size)
+        return result
+
+    return in_flight.do(key, fetch_and_cache)
+
+def fetch(sparql_query):
+    """
+    Sends the query to the Rhea SPARQL endpoint, or evaluates it against the
+    local RDF snapshot when the local provider is configured, returning the
+    decoded results along with the size of the response body.
+    """
+    if config['provider'] == 'local':
+        return local.query(sparql_query)
+
+    response = transport.get(
+        url=SPARQL_ENDPOINT,
         params={
             'query': sparql_query,
             'format' : 'application/sparql-results+json'
         }
     )
     if response.ok:
-        return response.json()
+        return response.json(), len(response.content)
     else:
         print(response.text)
         raise Exception(response.text)
@@ -110,6 +180,62 @@ def get(sparql_query):
 def get_records(sparql_query):
     return get(sparql_query).get('results').get('bindings')
 
+def iter_records(sparql_query):
+    """
+    Generates the bindings of the query's results one at a time, parsing them
+    as the response arrives (see sparql_json) rather than decoding the whole
+    body first, for queries whose results may be large. Results are answered
+    from the query cache when possible, and are cached when their body is at
+    most cache.max_streamed_bytes long.
+    """
+    query_cache = cache.get_cache()
+
+    key = cache.make_key(sparql_query)
+
+    if query_cache is not None:
+        result = query_cache.get(key)
+        if result is not None:
+            yield from result.get('results').get('bindings')
+            return
+
+    if config['provider'] == 'local':
+        result, size = local.query(sparql_query)
+        if query_cache is not None:
+            query_cache.put(key, result, size)
+        yield from result.get('results').get('bindings')
+        return
+
+    params = {
+        'query': sparql_query,
+        'format' : 'application/sparql-results+json'
+    }
+
+    with transport.get(SPARQL_ENDPOINT, params=params, stream=True) as response:
+        if not response.ok:
+            raise Exception(response.text)
+
+        max_size = config['cache']['max_streamed_bytes'] if query_cache is not None else 0
+        size = 0
+        kept = []
+
+        def chunks():
+            nonlocal size
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                size += len(chunk)
+                yield chunk
+
+        parser = BindingsParser(chunks())
+
+        for binding in parser:
+            if kept is not None and size > max_size:
+                kept = None
+            if kept is not None:
+                kept.append(binding)
+            yield binding
+
+    if kept is not None and size <= max_size:
+        query_cache.put(key, {'head' : parser.head, 'results' : {'bindings' : kept}}, size)
+
 def get_all_reactions_that_produce_compound(chebi_curie):
     """
     https://github.com/NCATS-Tangerine/mvp-module-library/blob/master/Rhea/Rhea.py
@@ -227,6 +353,24 @@ def build_id_filter(field:str, curies:List[str]) -> str:
     else:
         return ''
 
+def escape_string(s:str) -> str:
+    return s.replace('\\', '\\\\').replace('"', '\\"')
+
+def build_keyset_filter(fields:List[str], values:List[str]) -> str:
+    """
+    Filters out the rows whose (string) values of the given fields come at or
+    before the given values, in the order of ORDER BY str(?field1) str(?field2)
+    ..., so that a query can resume after the last row of a previous page.
+    """
+    if values is None:
+        return ''
+
+    disjuncts = []
+    for i, (field, value) in enumerate(zip(fields, values)):
+        equal = [f'str(?{f}) = "{escape_string(v)}"' for f, v in zip(fields[:i], values[:i])]
+        disjuncts.append('(' + ' && '.join(equal + [f'str(?{field}) > "{escape_string(value)}"']) + ')')
+    return f'FILTER ({" || ".join(disjuncts)}) .'
+
 def build_substring_filter2(fields:list, keywords:list) -> str:
     for field in fields:
         keywords = [escape_regex(k.lower()) for k in keywords]
@@ -262,9 +406,8 @@ def get_compound(curie):
         """
     )
 
-def find_compounds(keywords, limit=None, offset=None):
-    return get_records(
-        f"""
+def compounds_query(keywords=None, limit=None, offset=None):
+    return f"""
         PREFIX rh:<http://rdf.rhea-db.org/>
         SELECT ?compoundAc ?chebi
                (count(distinct ?reaction) as ?reactionCount)
@@ -280,12 +423,44 @@ def find_compounds(keywords, limit=None, offset=None):
           ?compound rh:accession ?compoundAc .
           {build_substring_filter('compoundName', keywords)}
         }}
+        GROUP BY ?compoundAc ?chebi ?compoundName
         ORDER BY ?reactionCount
         {build_limit(limit)}
         {build_offset(offset)}
         """
+
+def find_compounds(keywords, limit=None, offset=None):
+    """
+    Returns compound records in the shape of the SPARQL bindings. They are
+    searched in process when compound_names.csv has been built with
+    `make compounds` in the data directory, otherwise the endpoint is queried.
+    """
+    df = load_compound_df()
+
+    if df is None:
+        return get_records(compounds_query(keywords, limit, offset))
+
+    records = search(
+        df=df,
+        columns=['Name'],
+        keywords=keywords,
+        unique_columns='ID',
+        offset=offset,
+        size=limit
     )
 
+    return [compound_binding(record) for record in records]
+
+def compound_binding(record:dict) -> dict:
+    binding = {
+        'compoundAc' : {'value' : record['ID']},
+        'compoundName' : {'value' : record['Name']},
+        'reactionCount' : {'value' : str(record['ReactionCount'])},
+    }
+    if isinstance(record.get('ChEBI'), str):
+        binding['chebi'] = {'value' : record['ChEBI']}
+    return binding
+
 # def find_enzymes(keywords, limit=None, offset=None):
 #     """
 #     18. Select all approved reactions with CHEBI:17815 (a 1,2-diacyl-sn-glycerol) or one of its descendant. Display the EC numbers if the rhea-ec link exists
@@ -314,7 +489,7 @@ def find_compounds(keywords, limit=None, offset=None):
 #     )
 
 def get_rxn_and_compound_by_ec(ec_curie):
-    results = get(
+    results = iter_records(
         f"""
         PREFIX rh:<http://rdf.rhea-db.org/>
         PREFIX ec:<http://purl.uniprot.org/enzyme/>
@@ -330,7 +505,6 @@ def get_rxn_and_compound_by_ec(ec_curie):
         }}
         """
     )
-    results = results.get('results').get('bindings')
 
     rxn_equations = defaultdict(list)
     left_side_ids = defaultdict(list)
@@ -391,9 +565,11 @@ def get_ec_and_compound_by_rxn(rhea_curie):
         if 'compoundID' in result and 'compoundName' in result:
             compounds[results['compoundID']['value']] = result['compoundName']['value']
 
+    enzymes = list(enzymes)
+
     return {
         'equation' : equation,
-        'enzymes' : [{'id' : e, 'name' : get_enzyme_name(e)} for e in enzymes],
+        'enzymes' : [{'id' : e, 'name' : n} for e, n in zip(enzymes, get_enzyme_names(enzymes))],
         'compounds' : [{'id' : key, 'name' : value} for key, value in compounds.items()]
     }
 
@@ -430,9 +606,7 @@ def get_all_reactions(curie):
 
     print(q)
 
-    results = get(q)
-
-    results = results.get('results').get('bindings')
+    results = iter_records(q)
 
     rxn_equations = {}
     enzymes = defaultdict(set)
@@ -458,12 +632,15 @@ def get_all_reactions(curie):
         else:
             raise Exception(f'There should be only left sides or right sides, got: {side}')
 
+    all_enzymes = sorted({ec for ecs in enzymes.values() for ec in ecs})
+    enzyme_names = dict(zip(all_enzymes, get_enzyme_names(all_enzymes)))
+
     reactions = []
     for rhea_id, equation in rxn_equations.items():
         reactions.append({
             'rhea_id' : rhea_id,
             'equation' : rxn_equations[rhea_id],
-            'enzymes' : [{'id' : ec, 'name' : get_enzyme_name(ec)} for ec in enzymes[rhea_id]],
+            'enzymes' : [{'id' : ec, 'name' : enzyme_names[ec]} for ec in enzymes[rhea_id]],
             'left_side' : [{'id' : i, 'name' : n} for i, n in zip(left_side_ids[rhea_id], left_side_names[rhea_id])],
             'right_side' : [{'id' : i, 'name' : n} for i, n in zip(right_side_ids[rhea_id], right_side_names[rhea_id])]
         })
@@ -1,55 +1,239 @@
 import pandas as pd
 import re
+import heapq
+import threading
+from collections import defaultdict
 from typing import List, Union, Dict
 
+NGRAM_SIZE = 3
+
+# Multi-valued columns (e.g. enzyme synonyms) hold values joined with this
+SEPARATOR = ';'
+
+# Score contributions of a single column, before its column_multiplier
+MATCHED_KEYWORD_SCORE = 10
+OCCURRENCE_SCORE = 1
+WHOLE_WORD_SCORE = 3
+PREFIX_SCORE = 5
+IN_ORDER_SCORE = 20
+EXACT_KEYWORD_SCORE = 50
+EXACT_PHRASE_SCORE = 100
+
+def ngrams(text:str, n:int):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def tokenize(text:str) -> List[str]:
+    return re.findall(r'\w+', text)
+
+class SearchIndex(object):
+    """
+    An inverted index over the given columns of a dataframe, answering the
+    same case insensitive substring queries as `str.contains` without
+    scanning every row.
+
+    Every 1, 2 and 3-gram of the lower cased column values has a postings set
+    of the rows containing it. A keyword of up to three characters is looked
+    up directly, and a longer keyword's candidates are the intersection of the
+    postings of its trigrams, which are then verified. Whole word tokens are
+    indexed too.
+    """
+
+    def __init__(self, df:pd.DataFrame, columns:List[str], unique_columns:Union[List[str], str]=None):
+        self.columns = columns
+        self.records = df.to_dict(orient='records')
+
+        if isinstance(unique_columns, str):
+            unique_columns = [unique_columns]
+        self.unique_columns = unique_columns
+
+        self.texts = {}
+        self.grams = defaultdict(set)
+        self.tokens = defaultdict(set)
+        self.nonempty = set()
+
+        for column in columns:
+            values = []
+            for row, record in enumerate(self.records):
+                value = record.get(column)
+                value = value.lower() if isinstance(value, str) else None
+                values.append(value)
+
+                if value is None:
+                    continue
+
+                self.nonempty.add(row)
+
+                for n in range(1, NGRAM_SIZE + 1):
+                    for gram in ngrams(value, n):
+                        self.grams[gram].add(row)
+
+                for token in tokenize(value):
+                    self.tokens[token].add(row)
+
+            self.texts[column] = values
+
+    def contains(self, row:int, keyword:str) -> bool:
+        return any(self.texts[column][row] is not None and keyword in self.texts[column][row] for column in self.columns)
+
+    def lookup(self, keyword:str) -> set:
+        """
+        Returns the rows in which any of the columns contains the keyword.
+        """
+        keyword = keyword.lower()
+
+        if keyword == '':
+            return set(self.nonempty)
+
+        if len(keyword) <= NGRAM_SIZE:
+            return set(self.grams.get(keyword, ()))
+
+        postings = sorted((self.grams.get(gram, set()) for gram in ngrams(keyword, NGRAM_SIZE)), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+
+        return {row for row in candidates if self.contains(row, keyword)}
+
+    def score(self, row:int, keywords:List[str], column_multiplier:Dict[str, int]) -> int:
+        """
+        Scores how well the row matches the keywords, so that rows matching
+        the most keywords, whole, exactly and in the given order come first.
+        """
+        phrase = ' '.join(keywords)
+
+        total = 0
+        for column in self.columns:
+            text = self.texts[column][row]
+            if text is None:
+                continue
+
+            values = [v.strip() for v in text.split(SEPARATOR)]
+            tokens = set(tokenize(text))
+
+            c = 0
+            positions = []
+            for keyword in keywords:
+                position = text.find(keyword)
+                if position < 0:
+                    continue
+                positions.append(position)
+
+                c += MATCHED_KEYWORD_SCORE
+                c += text.count(keyword) * OCCURRENCE_SCORE
+
+                if keyword in tokens:
+                    c += WHOLE_WORD_SCORE
+                if keyword in values:
+                    c += EXACT_KEYWORD_SCORE
+
+            if len(positions) == len(keywords) and len(keywords) > 1 and positions == sorted(positions):
+                c += IN_ORDER_SCORE
+            if phrase in values:
+                c += EXACT_PHRASE_SCORE
+            if any(v.startswith(keywords[0]) for v in values):
+                c += PREFIX_SCORE
+
+            total += c * column_multiplier.get(column, 1)
+
+        return total
+
+    def match(self, keywords:List[str]) -> List[int]:
+        """
+        Returns, in dataframe order, the rows matching any of the keywords (all
+        rows when there are no keywords), keeping only the first row of each
+        value of the unique columns.
+        """
+        if keywords != []:
+            rows = set()
+            for keyword in keywords:
+                rows |= self.lookup(keyword)
+            rows = sorted(rows)
+        else:
+            rows = range(len(self.records))
+
+        if self.unique_columns is None:
+            return list(rows)
+
+        seen = set()
+        unique_rows = []
+        for row in rows:
+            key = tuple(self.records[row].get(c) for c in self.unique_columns)
+            if key not in seen:
+                seen.add(key)
+                unique_rows.append(row)
+        return unique_rows
+
+    def rank(self, rows:List[int], keywords:List[str], column_multiplier:Dict[str, int], offset=None, size=None) -> List[int]:
+        """
+        Orders rows by descending score (ties in dataframe order). When a size
+        is given only the best offset + size rows are selected, with a heap
+        rather than sorting every match.
+        """
+        scored = ((-self.score(row, keywords, column_multiplier), row) for row in rows)
+
+        if size is not None:
+            k = size + (offset if offset is not None else 0)
+            best = heapq.nsmallest(k, scored)
+        else:
+            best = sorted(scored)
+
+        return [row for _, row in best]
+
+    def search(self, keywords:Union[List[str], str], column_multiplier:Dict[str, int]=None, offset=None, size=None, metadata=False):
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        elif not isinstance(keywords, list):
+            keywords = []
+
+        if not isinstance(column_multiplier, dict):
+            column_multiplier = {}
+
+        rows = self.match(keywords)
+
+        total_num_rows = len(rows)
+
+        if keywords != []:
+            rows = self.rank(rows, [k.lower() for k in keywords], column_multiplier, offset, size)
+
+        if offset is not None:
+            rows = rows[offset:]
+        if size is not None:
+            rows = rows[:size]
+
+        records = [self.records[row] for row in rows]
+
+        if metadata:
+            return records, total_num_rows
+        else:
+            return records
+
+indexes = {}
+indexes_lock = threading.Lock()
 
 def search(df:pd.DataFrame, columns:Union[List[str], str], keywords:Union[List[str], str], column_multiplier:Dict[str, int]=None, unique_columns:Union[List[str], str]=None, offset=None, size=None, metadata=False):
+    """
+    Searches the given columns of the dataframe for the keywords. The index of
+    each dataframe (and set of columns) is built on first use and reused.
+    """
     if isinstance(columns, str):
         columns = [columns]
     elif not isinstance(columns, list):
         raise Exception(f'Columns must be of type string or list of strings, not {type(columns)}')
 
-    if isinstance(keywords, str):
-        keywords = [keywords]
-    elif not isinstance(keywords, list):
-        keywords = []
+    key = (id(df), tuple(columns), str(unique_columns))
 
-    if not isinstance(column_multiplier, dict):
-        column_multiplier = {}
+    entry = indexes.get(key)
 
-    if keywords != []:
-        q = df.apply(lambda x: False, axis=1)
-        for column in columns:
-            for keyword in keywords:
-                    q |= df[column].str.contains(keyword, case=False, regex=False)
+    if entry is None or entry[0] is not df:
+        with indexes_lock:
+            entry = indexes.get(key)
+            if entry is None or entry[0] is not df:
+                entry = indexes[key] = (df, SearchIndex(df, columns, unique_columns))
 
-        df = df[q == True]
+    _, index = entry
 
-        def count(row):
-            c = 0
-            for column in columns:
-                m = 1 if column not in column_multiplier else column_multiplier[column]
-                value = row[column]
-                if isinstance(value, str):
-                    for keyword in keywords:
-                        keyword, value = keyword.lower(), value.lower()
-                        c += value.count(keyword) * m
-            return c
-
-        if max(df.shape) == 0:
-            df['search_score'] = df.apply(count, axis=1)
-            df = df.sort_values(by=['search_score'], ascending=False)
-
-    df = df.drop_duplicates(subset=unique_columns)
-
-    total_num_rows = df.shape[0]
-
-    if offset is not None:
-        df = df.iloc[offset:]
-    if size is not None:
-        df = df.iloc[:size]
-
-    if metadata:
-        return df.to_dict(orient='records'), total_num_rows
-    else:
-        return df.to_dict(orient='records')
+    return index.search(
+        keywords=keywords,
+        column_multiplier=column_multiplier,
+        offset=offset,
+        size=size,
+        metadata=metadata
+    )
@@ -0,0 +1,52 @@
+"""
+Request coalescing: when several threads ask for the same key at once only the
+first one does the work, and the others wait for and share its result (or its
+exception).
+"""
+
+import threading
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight(object):
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Calls fn() unless a call for the same key is already in flight, in
+        which case waits for that call and returns its result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
@@ -0,0 +1,205 @@
+"""
+Results that are expensive to compute and only change with the Rhea release
+(e.g. the statement count of every predicate), persisted as JSON files so that
+they are computed once per release rather than once per process.
+
+A snapshot is served stale-while-revalidate: once there is any value it is
+returned straight away, and if it belongs to an older release or is older than
+`max_age` it is recomputed in a background thread. Only when there is no value
+at all does a caller wait for it to be computed. Snapshots are also refreshed
+every `refresh_interval` seconds once `start_schedule` has been called.
+Settings are in the `snapshots` section of config/config.yaml.
+
+Every worker process on a host shares the file: a process re-reads it when
+another has written it since, and refreshes are made under a lock on the file
+so that only one process computes the value while the others wait for and
+then read its result.
+"""
+
+import os
+import json
+import logging
+import threading
+import contextlib
+
+import data
+
+from time import time, sleep
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from config import config
+from beacon_controller.providers.release import get_release, UNKNOWN
+
+def snapshot_path() -> str:
+    return config['snapshots']['path'] or data.path
+
+@contextlib.contextmanager
+def file_lock(path:str):
+    """
+    Holds an exclusive lock on the file at path, shared with other processes.
+    Where fcntl isn't available this only excludes threads of this process.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class Snapshot(object):
+    def __init__(self, name:str, compute, complete=None):
+        """
+        compute is called with no arguments and must return a JSON serializable
+        value. If given, complete is called with a value and returns False when
+        it is only partial, in which case it is treated as stale.
+        """
+        self.name = name
+        self.compute = compute
+        self.complete = complete
+
+        self.value = None
+        self.release = None
+        self.created_at = None
+        self.mtime = None
+
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.refreshing = False
+
+    @property
+    def path(self) -> str:
+        return os.path.join(snapshot_path(), f'{self.name}.json')
+
+    def load(self):
+        """
+        Reads the file if it has been written since it was last read.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+
+        if mtime == self.mtime:
+            return
+
+        try:
+            with open(self.path, 'r') as f:
+                d = json.load(f)
+            self.value, self.release, self.created_at = d['value'], d['release'], d['created_at']
+            self.mtime = mtime
+        except Exception:
+            logging.exception(f'Could not read the {self.name} snapshot from {self.path}')
+
+    def save(self):
+        path = self.path
+        tmp = f'{path}.{os.getpid()}.tmp'
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(tmp, 'w') as f:
+            json.dump({'value' : self.value, 'release' : self.release, 'created_at' : self.created_at}, f)
+
+        os.replace(tmp, path)
+
+        self.mtime = os.stat(path).st_mtime
+
+    def is_stale(self) -> bool:
+        # Until the release is known the snapshot can't be told to be older
+        release = get_release()
+        if release != UNKNOWN and self.release != release:
+            return True
+        if self.complete is not None and not self.complete(self.value):
+            return True
+        return time() - self.created_at > config['snapshots']['max_age']
+
+    def put(self, value):
+        self.value, self.release, self.created_at = value, get_release(wait=True), time()
+
+        try:
+            self.save()
+        except Exception:
+            logging.exception(f'Could not write the {self.name} snapshot to {self.path}')
+
+    def refresh(self, max_age=None):
+        """
+        Recomputes and persists the value, unless another thread or process
+        did so while this one waited for the lock: then its value is used,
+        provided it isn't stale or (if given) older than max_age seconds.
+        """
+        before = self.created_at
+
+        with self.refresh_lock:
+            if self.created_at != before:
+                return self.value
+
+            with file_lock(f'{self.path}.lock'):
+                with self.lock:
+                    self.load()
+
+                if self.value is not None and not self.is_stale() and (max_age is None or time() - self.created_at < max_age):
+                    return self.value
+
+                start = time()
+                self.put(self.compute())
+
+                logging.info(f'Computed the {self.name} snapshot in {time() - start:.1f}s')
+
+                return self.value
+
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                logging.exception(f'Could not refresh the {self.name} snapshot')
+            finally:
+                self.refreshing = False
+
+        threading.Thread(target=run, name=f'{self.name}-refresh', daemon=True).start()
+
+    def has_value(self) -> bool:
+        with self.lock:
+            self.load()
+        return self.value is not None
+
+    def get(self):
+        if not self.has_value():
+            return self.refresh()
+
+        if self.is_stale():
+            self.refresh_in_background()
+
+        return self.value
+
+    def start_schedule(self):
+        """
+        Refreshes the snapshot once it is `refresh_interval` seconds old, in a
+        background thread. Whichever process gets to it first refreshes it,
+        and the others read its result and wait for the next one.
+        """
+        interval = config['snapshots']['refresh_interval']
+
+        def run():
+            while True:
+                self.has_value()
+                due = self.created_at + interval if self.created_at is not None else time() + interval
+                sleep(max(due - time(), 1))
+                try:
+                    self.refresh(max_age=interval)
+                except Exception:
+                    logging.exception(f'Could not refresh the {self.name} snapshot')
+
+        threading.Thread(target=run, name=f'{self.name}-schedule', daemon=True).start()
@@ -0,0 +1,153 @@
+"""
+An incremental parser for the SPARQL 1.1 JSON results format, yielding the
+bindings of a response one at a time as its body arrives, instead of decoding
+the whole body into one dict first. Only a single binding (and whatever is
+left of the chunk it came in) is held at any time, however large the result.
+
+    {"head": {"vars": [...]}, "results": {"bindings": [{...}, {...}, ...]}}
+
+The structure around the bindings is walked key by key; every other value
+(the head, "distinct", "ordered", ...) is decoded whole, as is each binding.
+"""
+
+import codecs
+import json
+
+from typing import Iterable, Iterator
+
+WHITESPACE = ' \t\n\r'
+
+decoder = json.JSONDecoder()
+
+class BindingsParser(object):
+    """
+    Parses the SPARQL JSON results read from chunks (an iterable of bytes, e.g.
+    a streamed requests.Response's iter_content). Iterating over the parser
+    yields the bindings; once they have been consumed `head` holds the head
+    (if it came before the results, as it does in practice).
+    """
+
+    def __init__(self, chunks:Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+        self.head = None
+
+    def read(self) -> bool:
+        """
+        Appends the next chunk to the buffer, dropping the part that has been
+        parsed already. Returns False at the end of the body.
+        """
+        if self.eof:
+            return False
+
+        chunk = next(self.chunks, None)
+
+        if chunk is None:
+            self.eof = True
+            text = self.decoder.decode(b'', final=True)
+        else:
+            text = self.decoder.decode(chunk)
+
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+
+        return True
+
+    def peek(self) -> str:
+        """
+        Returns the next character that isn't whitespace, without consuming
+        it, or '' at the end of the body.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self.read():
+                return ''
+
+    def expect(self, *characters:str) -> str:
+        c = self.peek()
+        if c not in characters:
+            raise ValueError(f'Expected {" or ".join(characters)} at {self.pos}, got {c or "end of input"}')
+        self.pos += 1
+        return c
+
+    def value(self):
+        """
+        Decodes the next complete JSON value, reading more of the body until
+        it has all arrived.
+        """
+        self.peek()
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.read():
+                    continue
+                raise
+
+            # A number at the very end of the buffer may continue in the next
+            # chunk
+            if end == len(self.buffer) and not self.eof and self.read():
+                continue
+
+            self.pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """
+        Walks the members of an object, yielding each key. The caller consumes
+        the member's value before asking for the next key.
+        """
+        self.expect('{')
+
+        if self.peek() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            key = self.value()
+            self.expect(':')
+
+            yield key
+
+            if self.expect(',', '}') == '}':
+                return
+
+    def bindings(self) -> Iterator[dict]:
+        self.expect('[')
+
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        while True:
+            yield self.value()
+
+            if self.expect(',', ']') == ']':
+                return
+
+    def __iter__(self) -> Iterator[dict]:
+        for key in self.members():
+            if key != 'results':
+                value = self.value()
+                if key == 'head':
+                    self.head = value
+                continue
+
+            for k in self.members():
+                if k == 'bindings':
+                    yield from self.bindings()
+                else:
+                    self.value()
+
+def iter_bindings(chunks:Iterable[bytes]) -> Iterator[dict]:
+    return iter(BindingsParser(chunks))
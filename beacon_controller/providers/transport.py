@@ -0,0 +1,53 @@
+"""
+A single connection-pooled HTTP session shared by everything that talks to an
+upstream service (the Rhea SPARQL endpoint, NCBI eutils, ...), so that
+keep-alive connections are reused instead of paying a new TCP+TLS handshake
+on every request. Pool size, timeouts and keep-alive are set in the `http`
+section of config/config.yaml.
+"""
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from config import config
+
+session = None
+
+def get_session() -> requests.Session:
+    global session
+
+    if session is None:
+        settings = config['http']
+
+        adapter = HTTPAdapter(
+            pool_connections=settings['pool_connections'],
+            pool_maxsize=settings['pool_size'],
+            max_retries=settings['max_retries'],
+        )
+
+        s = requests.Session()
+        s.mount('http://', adapter)
+        s.mount('https://', adapter)
+
+        if not settings['keep_alive']:
+            s.headers['Connection'] = 'close'
+
+        session = s
+
+    return session
+
+def get_timeout():
+    """
+    Returns the (connect, read) timeout tuple expected by requests.
+    """
+    settings = config['http']
+    return (settings['connect_timeout'], settings['read_timeout'])
+
+def get(url, **kwargs) -> requests.Response:
+    """
+    Issues a GET request through the shared session, applying the configured
+    timeouts unless the caller provides its own.
+    """
+    kwargs.setdefault('timeout', get_timeout())
+    return get_session().get(url, **kwargs)
@@ -1,85 +1,268 @@
+"""
+Exact matches between Rhea reactions and other reaction databases, from
+rhea2xrefs.tsv.
+
+The file is held as an XrefStore: integer RHEA ids, and the DB and ID columns
+as codes into interned string tables, along with the equivalence cliques of
+every CURIE (a sorted string table of the CURIEs, the clique of each, and the
+members of each clique in CSR form). It is read once, either from the .npy
+files written by data/build_xrefs.py (memory-mapped, so that worker processes
+on a host share the same pages) or else parsed from the TSV. Lookups binary
+search the arrays rather than building dicts of every CURIE in each process.
+"""
+
 import os
 
+import numpy as np
 import pandas as pd
 
-from data import path
-from typing import List
+import data
 
-df = None
-rheaIds = None
+from typing import List, Dict
 
-def load_rheaIds():
-    global rheaIds
+from beacon_controller.providers.datasets import dataset
+from beacon_controller.providers.graph import StringTable, csr
 
-    if rheaIds is None:
-        df = pd.read_csv(os.path.join(path, 'rhea2xrefs.tsv'), sep='\t', dtype=str)
-        rheaIds = df.RHEA_ID.unique()
+def xref_curies(db:str, local_id:str) -> List[str]:
+    if db == 'KEGG_REACTION':
+        return [f'KEGG:{local_id}', f'KEGG.REACTION:{local_id}']
+    else:
+        return [f'{db}:{local_id}']
 
-    return rheaIds
+class UnionFind(object):
+    def __init__(self):
+        self.parents = []
+        self.sizes = []
 
-def load_df():
-    """
-    This method loads and returns the dataframe. Rows for EC numbers are dropped
-    because these aren't true xrefs.
-    """
-    global df
+    def add(self) -> int:
+        self.parents.append(len(self.parents))
+        self.sizes.append(1)
+        return len(self.parents) - 1
 
-    if df is None:
-        df = pd.read_csv(os.path.join(path, 'rhea2xrefs.tsv'), sep='\t', dtype=str)
-        df = df[df.DB != 'EC']
+    def find(self, i:int) -> int:
+        parents = self.parents
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
 
-    return df
+    def union(self, i:int, j:int):
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return
+        if self.sizes[i] < self.sizes[j]:
+            i, j = j, i
+        self.parents[j] = i
+        self.sizes[i] += self.sizes[j]
 
-def get_xrefs(curie:str) -> List[str]:
+def build_cliques(reaction_ids, rows):
     """
-    Returns a list of exactly matching CURIE's to the given CURIE. The given
-    CURIE is contained in the returned list as long as it's recognized. If
-    the returned list is empty then Rhea is not aware of that CURIE.
+    Joins every row's RHEA_ID, MASTER_ID and xref CURIEs into one clique,
+    transitively; reactions with no xrefs are cliques of their own. Returns
+    the sorted CURIEs, the clique of each, and the CSR pointer and members
+    (positions of the CURIEs, in order) of each clique.
     """
-    if ':' not in curie:
-        return []
+    ids = {}
+    uf = UnionFind()
+
+    def node(curie):
+        i = ids.get(curie)
+        if i is None:
+            i = ids[curie] = uf.add()
+        return i
+
+    for rhea_id in reaction_ids:
+        node(f'RHEA:{rhea_id}')
+
+    for rhea_id, master_id, db, local_id in rows:
+        i = node(f'RHEA:{rhea_id}')
+        uf.union(i, node(f'RHEA:{master_id}'))
+        for curie in xref_curies(db, local_id):
+            uf.union(i, node(curie))
+
+    curies = sorted(ids)
+
+    roots = np.array([uf.find(ids[curie]) for curie in curies], dtype=np.int64)
+    _, curie_cliques = np.unique(roots, return_inverse=True)
+    curie_cliques = curie_cliques.astype(np.int32)
+
+    members = np.argsort(curie_cliques, kind='stable').astype(np.int32)
+    clique_ptr = csr(curie_cliques[members], int(curie_cliques.max()) + 1 if len(curies) > 0 else 0)
+
+    return StringTable.from_strings(curies), curie_cliques, clique_ptr, members
+
+class XrefStore(object):
+    STRING_TABLES = ['db_names', 'xref_ids', 'curies']
+    ARRAYS = ['rhea_ids', 'master_ids', 'dbs', 'ids', 'reaction_ids', 'curie_cliques', 'clique_ptr', 'clique_members']
+
+    def __init__(self, db_names:StringTable, xref_ids:StringTable, curies:StringTable, rhea_ids, master_ids, dbs, ids, reaction_ids, curie_cliques, clique_ptr, clique_members):
+        self.db_names = db_names
+        self.xref_ids = xref_ids
+        self.curies = curies
+        self.rhea_ids = rhea_ids
+        self.master_ids = master_ids
+        self.dbs = dbs
+        self.ids = ids
+        self.reaction_ids = reaction_ids
+        self.curie_cliques = curie_cliques
+        self.clique_ptr = clique_ptr
+        self.clique_members = clique_members
+
+    @classmethod
+    def from_tsv(cls, path):
+        df = pd.read_csv(path, sep='\t', usecols=['RHEA_ID', 'MASTER_ID', 'DB', 'ID'], dtype=str)
+
+        dbs = pd.Categorical(df.DB)
+        ids = pd.Categorical(df.ID)
+
+        rhea_ids = df.RHEA_ID.astype(np.int32).values
+        master_ids = df.MASTER_ID.astype(np.int32).values
+        reaction_ids = np.unique(rhea_ids)
+
+        db_names = list(dbs.categories)
+        xref_ids = list(ids.categories)
+
+        rows = (
+            (rhea_id, master_id, db_names[db], xref_ids[i])
+            for rhea_id, master_id, db, i in zip(rhea_ids.tolist(), master_ids.tolist(), dbs.codes.tolist(), ids.codes.tolist())
+            if db_names[db] != 'EC'
+        )
 
-    curie = curie.upper()
-    prefix, local_id = curie.split(':', 1)
+        curies, curie_cliques, clique_ptr, clique_members = build_cliques(reaction_ids.tolist(), rows)
 
-    df = load_df()
-    rheaIds = load_rheaIds()
+        return cls(
+            db_names=StringTable.from_strings(db_names),
+            xref_ids=StringTable.from_strings(xref_ids),
+            curies=curies,
+            rhea_ids=rhea_ids,
+            master_ids=master_ids,
+            dbs=dbs.codes.astype(np.int8),
+            ids=ids.codes.astype(np.int32),
+            reaction_ids=reaction_ids,
+            curie_cliques=curie_cliques,
+            clique_ptr=clique_ptr,
+            clique_members=clique_members,
+        )
 
-    if prefix == 'RHEA':
-        df = df[(df.RHEA_ID == local_id) | (df.MASTER_ID == local_id)]
+    def __len__(self):
+        return len(self.rhea_ids)
 
-        xrefs = set()
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self.STRING_TABLES:
+            getattr(self, name).save(path, name)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
 
-        if local_id in rheaIds:
-            xrefs.add(curie)
-        else:
-            return []
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        arrays = {}
+        for name in cls.STRING_TABLES:
+            arrays[name] = StringTable.load(path, name, mmap_mode)
+        for name in cls.ARRAYS:
+            arrays[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+        return cls(**arrays)
 
-        for index, row in df.iterrows():
-            if row.DB == 'KEGG_REACTION':
-                xrefs.add(f'KEGG:{row.ID}')
-                xrefs.add(f'KEGG.REACTION:{row.ID}')
+    def has_reaction(self, local_id:str) -> bool:
+        """
+        Whether rhea2xrefs.tsv knows of the reaction with the given RHEA id.
+        """
+        if not local_id.isdigit() or str(int(local_id)) != local_id:
+            return False
+        i = np.searchsorted(self.reaction_ids, int(local_id))
+        return bool(i < len(self.reaction_ids) and self.reaction_ids[i] == int(local_id))
 
-            else:
-                xrefs.add(f'{row.DB}:{row.ID}')
+    def clique_of(self, curie:str):
+        """
+        Returns the clique id of the CURIE, or None if it is in no clique.
+        """
+        i = self.curies.index(curie)
+        return int(self.curie_cliques[i]) if i is not None else None
 
-            xrefs.add(f'RHEA:{row.RHEA_ID}')
-            xrefs.add(f'RHEA:{row.MASTER_ID}')
+    def members(self, clique:int) -> List[str]:
+        """
+        Returns the sorted CURIEs of the clique.
+        """
+        lo, hi = self.clique_ptr[clique], self.clique_ptr[clique + 1]
+        return [self.curies[i] for i in self.clique_members[lo:hi].tolist()]
 
-        return list(xrefs)
+    def clique_sizes(self) -> List[int]:
+        return np.diff(self.clique_ptr).tolist()
 
+    def count_prefix(self, prefix:str) -> int:
+        """
+        Returns the number of distinct CURIEs with the given prefix in all
+        cliques, from the range of the sorted CURIEs that start with it.
+        """
+        return self.curies.lower_bound(f'{prefix};') - self.curies.lower_bound(f'{prefix}:')
+
+    def count_xref_reactions(self) -> int:
+        """
+        Returns the number of distinct reactions (RHEA_ID) with an xref other
+        than an EC number. Unlike count_prefix('RHEA') this leaves out the
+        master and directional reactions that are only linked to them.
+        """
+        ec = self.db_names.index('EC')
+        rhea_ids = self.rhea_ids if ec is None else self.rhea_ids[np.asarray(self.dbs) != ec]
+        return len(np.unique(rhea_ids))
+
+def tsv_path() -> str:
+    return os.path.join(data.path, 'rhea2xrefs.tsv')
+
+def store_path() -> str:
+    return os.path.join(data.path, 'xrefs')
+
+@dataset('xrefs')
+def load_store() -> XrefStore:
+    path = store_path()
+
+    if os.path.exists(os.path.join(path, 'clique_ptr.npy')):
+        return XrefStore.load(path)
     else:
-        if prefix == 'KEGG' or prefix == 'KEGG.REACTION':
-            df = df[(df.DB == 'KEGG_REACTION') & (df.ID == local_id)]
-        else:
-            df = df[(df.DB == prefix) & (df.ID == local_id)]
+        return XrefStore.from_tsv(tsv_path())
+
+def clique_sizes() -> List[int]:
+    return load_store().clique_sizes()
+
+def count_prefix(prefix:str) -> int:
+    """
+    Returns the number of distinct CURIEs with the given prefix in all cliques.
+    """
+    return load_store().count_prefix(prefix)
+
+def count_xref_reactions() -> int:
+    return load_store().count_xref_reactions()
+
+def get_xrefs_batch(curies:List[str]) -> Dict[str, List[str]]:
+    """
+    Returns a dict of each of the given CURIEs to its list of exactly matching
+    CURIEs, the members of its clique. Unknown CURIEs have no matches.
+    """
+    store = load_store()
+
+    results = {}
 
-        xrefs = set()
+    for curie in curies:
+        if ':' not in curie:
+            results[curie] = []
+            continue
 
-        for index, row in df.iterrows():
-            xrefs.update(get_xrefs(f'RHEA:{row.RHEA_ID}'))
+        upper = curie.upper()
+        prefix, local_id = upper.split(':', 1)
 
-            xrefs.add(f'RHEA:{row.RHEA_ID}')
-            xrefs.add(f'RHEA:{row.MASTER_ID}')
+        if prefix == 'RHEA' and not store.has_reaction(local_id):
+            results[curie] = []
+            continue
 
-        return list(xrefs)
+        c = store.clique_of(upper)
+        results[curie] = store.members(c) if c is not None else []
+
+    return results
+
+def get_xrefs(curie:str) -> List[str]:
+    """
+    Returns a list of exactly matching CURIE's to the given CURIE. The given
+    CURIE is contained in the returned list as long as it's recognized. If
+    the returned list is empty then Rhea is not aware of that CURIE.
+    """
+    return get_xrefs_batch([curie])[curie]
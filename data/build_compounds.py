@@ -0,0 +1,29 @@
+"""
+Builds compound_names.csv, the index of every compound taking part in an
+approved reaction that rhea.find_compounds searches in process. The query is
+answered by whichever provider is configured in config/config.yaml.
+"""
+
+import pandas as pd
+
+from beacon_controller.providers import rhea
+
+print('Getting compounds')
+
+records = rhea.get_records(rhea.compounds_query())
+
+rows = []
+for record in records:
+    chebi = record.get('chebi')
+    rows.append({
+        'ID' : record['compoundAc']['value'],
+        'ChEBI' : chebi['value'] if chebi is not None else None,
+        'Name' : record['compoundName']['value'],
+        'ReactionCount' : int(record['reactionCount']['value']),
+    })
+
+df = pd.DataFrame(rows, columns=['ID', 'ChEBI', 'Name', 'ReactionCount'])
+df = df.sort_values('ReactionCount', kind='mergesort')
+df.to_csv('compound_names.csv', sep='\t', index=False)
+
+print('Written:', len(df))
@@ -0,0 +1,23 @@
+"""
+Materializes the statements of every predicate into the indexed tables used
+by beacon_controller.providers.edges (by default into data/graph/edges). The
+graph snapshot must have been built first with build_graph.py.
+"""
+
+from beacon_controller.providers import edges, graph
+
+g = graph.load_graph()
+
+if g is None:
+    quit('Build the graph snapshot first with build_graph.py')
+
+tables = edges.build(g)
+
+for predicate, table in tables.items():
+    print(predicate.name, len(table))
+
+path = edges.tables_path()
+
+edges.save(tables, path)
+
+print('Written to', path)
@@ -0,0 +1,21 @@
+"""
+Builds the memory-mapped Rhea graph snapshot used by
+beacon_controller.providers.graph (by default into data/graph). The queries are
+answered by whichever provider is configured in config/config.yaml, so with
+`provider: local` the snapshot is built from the downloaded RDF dump.
+"""
+
+from beacon_controller.providers import graph, rhea
+from beacon_controller.providers.release import get_release
+
+path = graph.graph_path()
+
+print('Querying Rhea')
+
+g = graph.build(rhea.get_records, release=get_release(wait=True))
+
+print('Reactions:', len(g.reaction_accessions), ', Compounds:', len(g.compound_accessions), ', Enzymes:', len(g.ec_numbers))
+
+g.save(path)
+
+print('Written to', path)
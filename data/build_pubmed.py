@@ -0,0 +1,44 @@
+"""
+Downloads the PubMed summaries of every article cited by a Rhea reaction into
+the beacon's summary store (by default data/pubmed.sqlite), so that statement
+details can be served without calling NCBI. Summaries that are already stored
+are not downloaded again, so rerunning this only fetches newly cited articles.
+NCBI's rate limit is respected, and `pubmed.base_url` in config/config.yaml
+can point it at a stub instead.
+"""
+
+from config import config
+from beacon_controller.providers import pubmed, rhea
+
+q = """
+PREFIX rh:<http://rdf.rhea-db.org/>
+SELECT DISTINCT ?citation WHERE {
+  ?reaction rdfs:subClassOf rh:Reaction .
+  ?reaction rh:citation ?citation .
+}
+"""
+
+print('Getting citations')
+
+pmids = sorted({pubmed.normalize_pmid(r['citation']['value']) for r in rhea.get_records(q)})
+
+store = pubmed.get_summary_cache()
+
+if store is None:
+    quit('Enable pubmed.cache in config.yaml to build the summary store')
+
+stored = store.get_many(pmids)
+missing = [p for p in pmids if p not in stored]
+
+print('Citations:', len(pmids), ', Already stored:', len(stored), ', To download:', len(missing))
+
+config['pubmed']['offline'] = False
+
+client = pubmed.PubMedRetreiver(email='lance@starinformatics.com')
+
+downloaded = 0
+for chunk in pubmed.partition_generator(missing, 1000):
+    downloaded += len(client.get(chunk))
+    print('Downloaded:', downloaded, '/', len(missing))
+
+print('Written to', store.path)
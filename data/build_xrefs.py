@@ -0,0 +1,16 @@
+"""
+Converts rhea2xrefs.tsv into the compact store that
+beacon_controller.providers.xrefs memory-maps (by default data/xrefs).
+"""
+
+from beacon_controller.providers import xrefs
+
+store = xrefs.XrefStore.from_tsv(xrefs.tsv_path())
+
+print('Xrefs:', len(store), ', Databases:', len(store.db_names), ', Identifiers:', len(store.xref_ids))
+
+path = xrefs.store_path()
+
+store.save(path)
+
+print('Written to', path)
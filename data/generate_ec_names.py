@@ -32,7 +32,15 @@ order by ?ec
 
 print('Getting enzymes')
 
-response = requests.get(
+# Use the beacon's pooled session (and its configured timeouts) when the
+# application is installed, otherwise fall back to a plain session.
+try:
+    from beacon_controller.providers import transport
+    get = transport.get
+except ImportError:
+    get = requests.Session().get
+
+response = get(
     url="https://sparql.rhea-db.org/sparql",
     params={
         'query': q,
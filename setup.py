@@ -15,7 +15,7 @@ setup(
     install_requires=[
         'bmt',
         'biolinkml',
-        'tornado',
+        'tornado >= 6.3',
         'requests',
         'flask',
         'pyyaml',
@@ -23,6 +23,10 @@ setup(
         'python_dateutil == 2.6.1',
         'setuptools >= 21.0.0',
         'pandas',
+        'numpy',
         'bmt',
-    ]
+    ],
+    extras_require={
+        'local': ['rdflib'],
+    }
 )